@@ -1,88 +1,224 @@
 import requests
-from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID
+from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID, PUBLIC_API_URL
 from services.cache import get_cache
-from services.airtable_client import get_airtable_client
+from services.airtable_client import get_async_airtable_client
+from services.singleflight import SingleFlight
+from services.expert_catalog import get_expert_catalog
+from services.photo_cache import photo_attachment
 import logging
+from typing import List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
 TABLE_NAME = "Experts"
-CACHE_TTL = 300  # 5 минут кэширования
+CACHE_TTL = 300  # 5 минут кэширования, затем обновление в фоне
+CACHE_STALE_TTL = 600  # ещё 10 минут отдаём устаревший список, не дожидаясь Airtable
 
+APPROVED_STATUSES = {"🟢 Approved", "Approved", "🟢 Одобрено", "Одобрено"}
 
-def get_approved_experts(use_cache: bool = True):
+# Одновременные промахи кэша делят один запрос к Airtable
+_approved_experts_flight = SingleFlight()
+
+# Список одобренных, построенный из каталога: (версия каталога, эксперты)
+_catalog_experts = (None, [])
+
+# Поле эксперта в API -> поля Airtable, из которых оно строится
+EXPERT_FIELD_SOURCES = {
+    "id": (),
+    "telegram_id": ("TelegramID",),
+    "name": ("Name",),
+    "city": ("City",),
+    "language": ("Language",),
+    "direction": ("Direction",),
+    "directions": ("Direction",),
+    "telegram": ("Telegram",),
+    "photo_url": ("Photo",),
+    "status": ("Status",),
+    "education": ("Education",),
+    "experience": ("Experience",),
+    "clients": ("Clients",),
+    "average_check": ("AverageCheck",),
+    "audience": ("Audience",),
+    "positioning": ("Positioning",),
+    "methods": ("Methods",),
+    "formats": ("Format",),
+    "requests": ("Requests",),
+    "description": ("Description",),
+}
+
+# Поля карточки галереи (fields=card)
+CARD_FIELDS = ("id", "telegram_id", "name", "photo_url", "city", "direction", "language")
+
+# Поля, по которым /api/experts фильтрует и считает фасеты — нужны всегда
+SEARCH_FIELDS = ("language", "city", "directions", "methods", "formats", "requests")
+
+
+def format_expert_record(record: dict):
+    """Приводит запись Airtable к формату эксперта для API и Mini App"""
+    fields = record.get("fields", {})
+
+    direction = (
+        fields["Direction"][0]
+        if isinstance(fields.get("Direction"), list) and fields["Direction"]
+        else fields.get("Direction")
+    )
+
+    # Фото отдаётся через /api/photo: исходные ссылки Airtable истекают,
+    # а v= (id вложения) меняется вместе с фото, поэтому ссылку можно кэшировать навсегда
+    attachment = photo_attachment(record)
+    photo_url = (
+        f"{PUBLIC_API_URL}/api/photo/{record.get('id')}?v={attachment.get('id', '')}"
+        if attachment is not None
+        else None
+    )
+
+    return {
+        "id": record.get("id"),
+        "telegram_id": str(fields.get("TelegramID", "")) if fields.get("TelegramID") is not None else "",
+        "name": fields.get("Name"),
+        "city": fields.get("City"),
+        "language": fields.get("Language", "ru"),  # 🔹 язык по умолчанию
+        "direction": direction,
+        "directions": fields["Direction"] if isinstance(fields.get("Direction"), list) else (
+            [fields["Direction"]] if fields.get("Direction") else []
+        ),
+        "telegram": fields.get("Telegram"),
+        "photo_url": photo_url,
+        "status": fields.get("Status"),
+        "education": fields.get("Education"),
+        "experience": fields.get("Experience"),
+        "clients": fields.get("Clients"),
+        "average_check": fields.get("AverageCheck"),
+        "audience": fields.get("Audience"),
+        "positioning": fields.get("Positioning"),
+        "methods": fields.get("Methods", []),
+        "formats": fields.get("Format", []),
+        "requests": fields.get("Requests", []),
+        "description": fields.get("Description"),
+    }
+
+
+def resolve_fields(fields_param: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Разбирает параметр fields= (список через запятую или "card")
+    None — все поля; неизвестное поле — ValueError
+    """
+    if not fields_param:
+        return None
+    requested = []
+    for name in fields_param.split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name == "card":
+            requested.extend(CARD_FIELDS)
+        elif name in EXPERT_FIELD_SOURCES:
+            requested.append(name)
+        else:
+            raise ValueError(f"Unknown field: {name}")
+    # Порядок полей как в полном ответе, без повторов
+    requested_set = set(requested)
+    return tuple(name for name in EXPERT_FIELD_SOURCES if name in requested_set) or None
+
+
+def project_expert(expert: dict, fields: Optional[Tuple[str, ...]]) -> dict:
+    """Оставляет в эксперте только запрошенные поля"""
+    if fields is None:
+        return expert
+    return {name: expert.get(name) for name in fields}
+
+
+def _airtable_fields(fields: Optional[Tuple[str, ...]]) -> Optional[List[str]]:
+    """Поля Airtable для проекции (плюс поля поиска); None — все поля"""
+    if fields is None:
+        return None
+    names = set()
+    for name in fields + SEARCH_FIELDS:
+        names.update(EXPERT_FIELD_SOURCES[name])
+    return sorted(names)
+
+
+async def _fetch_approved_experts(airtable_fields: Optional[List[str]] = None):
+    """Потоково читает одобренных экспертов из Airtable и форматирует их"""
+    client = get_async_airtable_client()
+    formula = "OR({Status}='🟢 Approved', {Status}='Approved', {Status}='🟢 Одобрено', {Status}='Одобрено')"
+
+    experts = []
+    async for record in client.iter_records(table_name=TABLE_NAME, formula=formula, fields=airtable_fields):
+        experts.append(format_expert_record(record))
+    return experts
+
+
+async def _load_approved_experts(airtable_fields: Optional[List[str]] = None):
+    key = ("approved_experts", tuple(airtable_fields or ()))
+    experts = await _approved_experts_flight.do(key, lambda: _fetch_approved_experts(airtable_fields))
+    logger.info(f"Loaded {len(experts)} approved experts from Airtable")
+    return experts
+
+
+def _approved_from_catalog(catalog):
+    """Одобренные эксперты из локального каталога (пересчёт только при смене версии)"""
+    global _catalog_experts
+    version, experts = _catalog_experts
+    if version != catalog.version:
+        experts = [
+            format_expert_record(record)
+            for record in catalog.all()
+            if record.get("fields", {}).get("Status") in APPROVED_STATUSES
+        ]
+        _catalog_experts = (catalog.version, experts)
+    return experts
+
+
+async def get_approved_experts(use_cache: bool = True, fields: Optional[Tuple[str, ...]] = None):
     """
     Возвращает всех экспертов со статусом 'Approved' или 'Одобрено'
     (поддерживает RU/EN форматы и эмодзи перед статусом)
-    С кэшированием для уменьшения нагрузки на Airtable API
+    Читает все страницы таблицы потоково, без ограничения в 100 записей
+    С кэшированием для уменьшения нагрузки на Airtable API:
+    после CACHE_TTL список отдаётся из кэша и обновляется в фоне,
+    ожидание Airtable только при пустом кэше или после CACHE_STALE_TTL;
+    одновременные промахи кэша объединяются в один запрос
+    Если локальный каталог загружен (в т.ч. из снимка на диске),
+    список строится из него без обращения к Airtable
+    fields — проекция (см. resolve_fields): при чтении из Airtable запрашиваются
+    только нужные для неё и для поиска поля, остальные в экспертах будут пустыми.
+    Сама проекция ответа применяется вызывающим кодом (project_expert)
+    """
+    _, experts = await get_approved_experts_versioned(use_cache, fields)
+    return experts
+
+
+async def get_approved_experts_versioned(
+    use_cache: bool = True,
+    fields: Optional[Tuple[str, ...]] = None
+) -> Tuple[Optional[str], list]:
+    """
+    То же, что get_approved_experts, но возвращает (версия содержимого, эксперты)
+    Версия меняется только вместе с данными (версия каталога или время загрузки
+    записи кэша), поэтому по ней можно не перестраивать производные структуры,
+    даже если бэкенд кэша каждый раз отдаёт новый объект списка.
+    None — данные загружены напрямую из Airtable, версии нет
     """
-    cache = get_cache()
-    cache_key = "approved_experts"
-    
-    # Проверяем кэш
-    if use_cache:
-        cached = cache.get(cache_key)
-        if cached is not None:
-            logger.debug("Returning cached experts list")
-            return cached
-    
     try:
-        client = get_airtable_client()
-        formula = "OR({Status}='🟢 Approved', {Status}='Approved', {Status}='🟢 Одобрено', {Status}='Одобрено')"
-        
-        records = client.get_records(
-            table_name=TABLE_NAME,
-            formula=formula,
-            max_records=100
-        )
+        catalog = get_expert_catalog()
+        if use_cache and catalog.ready:
+            return f"catalog:{catalog.version}", _approved_from_catalog(catalog)
 
-        experts = []
-        for record in records:
-            fields = record.get("fields", {})
-            expert = {
-                "id": record.get("id"),
-                "telegram_id": str(fields.get("TelegramID", "")) if fields.get("TelegramID") is not None else "",
-                "name": fields.get("Name"),
-                "city": fields.get("City"),
-                "language": fields.get("Language", "ru"),  # 🔹 язык по умолчанию
-                "direction": (
-                    fields["Direction"][0]
-                    if isinstance(fields.get("Direction"), list)
-                    else fields.get("Direction")
-                ),
-                "telegram": fields.get("Telegram"),
-                "photo_url": (
-                    fields["Photo"][0]["url"]
-                    if isinstance(fields.get("Photo"), list) and fields["Photo"]
-                    else None
-                ),
-                "status": fields.get("Status"),
-                "education": fields.get("Education"),
-                "experience": fields.get("Experience"),
-                "clients": fields.get("Clients"),
-                "average_check": fields.get("AverageCheck"),
-                "audience": fields.get("Audience"),
-                "positioning": fields.get("Positioning"),
-                "methods": fields.get("Methods", []),
-                "formats": fields.get("Format", []),
-                "requests": fields.get("Requests", []),
-                "description": fields.get("Description"),
-            }
-            experts.append(expert)
-
-        # Сохраняем в кэш
-        if use_cache:
-            cache.set(cache_key, experts, ttl=CACHE_TTL)
-            logger.info(f"Cached {len(experts)} approved experts for {CACHE_TTL} seconds")
-
-        return experts
+        airtable_fields = _airtable_fields(fields)
+        if not use_cache:
+            return None, await _load_approved_experts(airtable_fields)
+
+        cache_key = "approved_experts" if airtable_fields is None else "approved_experts:" + ",".join(airtable_fields)
+        cache = get_cache()
+        entry = await cache.get_or_refresh_entry(
+            cache_key,
+            lambda: _load_approved_experts(airtable_fields),
+            ttl=CACHE_TTL,
+            stale_ttl=CACHE_STALE_TTL
+        )
+        return f"cache:{cache_key}:{entry['created_at']}", entry["value"]
 
     except Exception as e:
         logger.error(f"Error fetching approved experts: {e}", exc_info=True)
-        # В случае ошибки пытаемся вернуть кэшированные данные, если есть
-        if use_cache:
-            cached = cache.get(cache_key)
-            if cached is not None:
-                logger.warning("Returning stale cache due to error")
-                return cached
-        return []
+        return None, []
@@ -0,0 +1,107 @@
+"""
+Приём обновлений Telegram через webhook внутри API
+Запрос проверяется по секретному пути и заголовку X-Telegram-Bot-Api-Secret-Token,
+обновление передаётся в общий Dispatcher в фоне, а Telegram сразу получает 200.
+Одновременно обрабатывается не больше max_concurrency обновлений; если очередь
+переполнена, отвечаем 503 — Telegram повторит доставку позже.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from typing import Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from pydantic import ValidationError
+
+from config import BOT_TOKEN, WEBHOOK_SECRET, WEBHOOK_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_PATH_PREFIX = "/telegram/webhook/"
+# Сколько обновлений может ждать обработки сверх выполняемых
+PENDING_PER_WORKER = 4
+# Сколько секунд при остановке ждём уже принятые обновления
+SHUTDOWN_TIMEOUT = 10
+
+
+def webhook_secret() -> str:
+    """Секрет webhook: из WEBHOOK_SECRET или стабильно выведенный из токена бота"""
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    return hashlib.sha256(f"webhook:{BOT_TOKEN}".encode("utf-8")).hexdigest()[:32]
+
+
+def webhook_path(secret: str) -> str:
+    """Секретный путь (отличается от секрета заголовка, который не попадает в логи)"""
+    return WEBHOOK_PATH_PREFIX + hashlib.sha256(f"path:{secret}".encode("utf-8")).hexdigest()[:24]
+
+
+class BotWebhook:
+    """Передаёт обновления из HTTP-запросов в Dispatcher с ограничением параллелизма"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        dispatcher: Dispatcher,
+        secret: str,
+        max_concurrency: int = WEBHOOK_MAX_CONCURRENCY
+    ):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.secret = secret
+        self.path = webhook_path(secret)
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_concurrency * PENDING_PER_WORKER
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+
+    def check_secret(self, header_value: str) -> bool:
+        return hmac.compare_digest(header_value or "", self.secret)
+
+    def accept(self, body: bytes) -> bool:
+        """
+        Ставит обновление (тело запроса Telegram) в обработку; False — очередь переполнена
+        Некорректное тело подтверждается и отбрасывается: иначе Telegram
+        будет бесконечно повторять доставку того же обновления
+        """
+        if len(self._tasks) >= self.max_pending:
+            return False
+        try:
+            update = Update.model_validate(json.loads(body), context={"bot": self.bot})
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Dropping malformed webhook update: {e}")
+            return True
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _process(self, update: Update) -> None:
+        async with self._semaphore:
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+
+    async def register(self, base_url: str) -> None:
+        """Регистрирует webhook в Telegram"""
+        url = base_url.rstrip("/") + self.path
+        await self.bot.set_webhook(
+            url,
+            secret_token=self.secret,
+            allowed_updates=self.dispatcher.resolve_used_update_types(),
+            max_connections=self.max_concurrency,
+        )
+        logger.info(f"Telegram webhook registered at {base_url.rstrip('/')}{WEBHOOK_PATH_PREFIX}…")
+
+    async def shutdown(self) -> None:
+        """Дожидается принятых обновлений, сохраняет FSM и закрывает сессию бота (webhook не снимаем)"""
+        if self._tasks:
+            done, pending = await asyncio.wait(set(self._tasks), timeout=SHUTDOWN_TIMEOUT)
+            for task in pending:
+                task.cancel()
+        await self.dispatcher.storage.close()
+        await self.bot.session.close()
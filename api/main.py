@@ -1,24 +1,39 @@
 from fastapi import FastAPI, Query, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel
-from api.airtable_service import get_approved_experts
+from api.airtable_service import get_approved_experts_versioned, format_expert_record, resolve_fields, project_expert
+from services.expert_search import get_search_index
+from services.rate_limiter import RateLimiter, RouteLimit
+from services.metrics import get_metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from api.responses import get_json_responder, make_etag
+from api.pagination import InvalidCursor, decode_cursor, encode_cursor, filters_key
+from api.static_assets import (
+    PrecompressedStaticFiles,
+    IndexHtmlCache,
+    precompress_directory,
+    IMMUTABLE_CACHE_CONTROL,
+)
+from api.bot_webhook import BotWebhook, WEBHOOK_PATH_PREFIX, webhook_secret
+from services.photo_cache import get_photo_cache, photo_attachment, PHOTO_SIZES, DEFAULT_PHOTO_SIZE
 import requests
 import os
+import asyncio
 import aiohttp
 import time
-from collections import defaultdict
+import random
+import re
+from typing import List, Optional
 from datetime import datetime, timedelta
-from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID, BOT_TOKEN
+from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID, BOT_TOKEN, BOT_MODE, WEBHOOK_BASE_URL
 
 # ==========================
 # 🚀 Инициализация приложения
 # ==========================
 # Настройка логирования
 from services.logger_config import setup_logging
-from config import ENV
+from config import ENV, REQUEST_LOG_SAMPLE_RATE
 import logging
 
 json_format = ENV == "prod"
@@ -30,31 +45,66 @@ app = FastAPI(title="PAZL Collab API")
 # ==========================
 # 🛡️ Rate Limiting
 # ==========================
-# Простой in-memory rate limiter
-rate_limit_store = defaultdict(list)
+# Скользящее окно: O(1) на запрос, неактивные IP периодически удаляются
 RATE_LIMIT_REQUESTS = 100  # Максимум запросов
 RATE_LIMIT_WINDOW = 60  # За окно в секундах
+RATE_LIMIT_ROUTES = [
+    # Заявки на партнёрство отправляют сообщения в Telegram — лимит строже
+    RouteLimit("partnership", "/api/partnership", 10, 60),
+    # Галерея грузит фото каждой карточки — лимит выше
+    RouteLimit("photo", "/api/photo", 300, 60),
+    RouteLimit("api", "/api/", RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW),
+]
+rate_limiter = RateLimiter(RATE_LIMIT_ROUTES, RATE_LIMIT_REQUESTS, RATE_LIMIT_WINDOW)
 
 # ==========================
 # 📝 Логирование запросов
 # ==========================
+HTTP_LATENCY = get_metrics_registry().histogram(
+    "http_request_duration_seconds",
+    "API request latency by method, route template and status",
+    ("method", "route", "status")
+)
+
+# Успешные быстрые запросы логируются выборочно (доля REQUEST_LOG_SAMPLE_RATE),
+# ошибки и медленные запросы — всегда
+SLOW_REQUEST_SECONDS = 1.0
+
+
 @app.middleware("http")
 async def logging_middleware(request: Request, call_next):
     """
-    Логирование всех запросов для отладки
+    Логирование запросов: одна строка на запрос, успешные — с сэмплированием
     """
     start_time = time.time()
     
-    # Логируем входящий запрос
-    logger.info(f"→ {request.method} {request.url.path} | Client: {request.client.host if request.client else 'unknown'}")
-    
     try:
         response = await call_next(request)
         process_time = time.time() - start_time
-        logger.info(f"← {request.method} {request.url.path} | Status: {response.status_code} | Time: {process_time:.3f}s")
+        # Шаблон маршрута, а не путь: /api/expert/{record_id} — одна серия
+        route = request.scope.get("route")
+        HTTP_LATENCY.observe(
+            process_time,
+            request.method,
+            getattr(route, "path", "unmatched"),
+            str(response.status_code)
+        )
+        if (
+            response.status_code >= 400
+            or process_time >= SLOW_REQUEST_SECONDS
+            or random.random() < REQUEST_LOG_SAMPLE_RATE
+        ):
+            logger.info(
+                "%s %s | Client: %s | Status: %s | Time: %.3fs",
+                request.method, request.url.path,
+                request.client.host if request.client else "unknown",
+                response.status_code, process_time
+            )
         return response
     except Exception as e:
         process_time = time.time() - start_time
+        route = request.scope.get("route")
+        HTTP_LATENCY.observe(process_time, request.method, getattr(route, "path", "unmatched"), "500")
         logger.error(f"✗ {request.method} {request.url.path} | Error: {str(e)} | Time: {process_time:.3f}s", exc_info=True)
         raise
 
@@ -62,36 +112,25 @@ async def logging_middleware(request: Request, call_next):
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
     """Rate limiting middleware для защиты от злоупотреблений"""
-    # Пропускаем статические файлы
-    if request.url.path.startswith("/webapp/assets"):
+    # Пропускаем статические файлы и webhook Telegram (защищён секретом)
+    if request.url.path.startswith(("/webapp/assets", WEBHOOK_PATH_PREFIX)):
         return await call_next(request)
     
     # Получаем IP клиента
     client_ip = request.client.host if request.client else "unknown"
     
     # Проверяем rate limit
-    now = time.time()
-    window_start = now - RATE_LIMIT_WINDOW
-    
-    # Очищаем старые записи
-    rate_limit_store[client_ip] = [
-        timestamp for timestamp in rate_limit_store[client_ip]
-        if timestamp > window_start
-    ]
-    
-    # Проверяем лимит
-    if len(rate_limit_store[client_ip]) >= RATE_LIMIT_REQUESTS:
+    allowed, retry_after, route = await rate_limiter.check(client_ip, request.url.path)
+    if not allowed:
         return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             content={
                 "error": "Too many requests",
-                "message": f"Rate limit exceeded. Maximum {RATE_LIMIT_REQUESTS} requests per {RATE_LIMIT_WINDOW} seconds."
-            }
+                "message": f"Rate limit exceeded. Maximum {route.limit} requests per {route.window} seconds."
+            },
+            headers={"Retry-After": str(retry_after)}
         )
     
-    # Добавляем текущий запрос
-    rate_limit_store[client_ip].append(now)
-    
     # Продолжаем обработку
     response = await call_next(request)
     return response
@@ -104,12 +143,16 @@ BASE_DIR = os.path.dirname(os.path.dirname(__file__))   # pazl-collab-bot/
 FRONTEND_DIST = os.path.join(BASE_DIR, "frontend", "dist")
 
 # 1️⃣ Ассеты (CSS/JS) - должен быть ПЕРВЫМ
+# Имена ассетов содержат хеш — отдаём предсжатые варианты с immutable-кэшем
 app.mount(
     "/webapp/assets",
-    StaticFiles(directory=os.path.join(FRONTEND_DIST, "assets")),
+    PrecompressedStaticFiles(directory=os.path.join(FRONTEND_DIST, "assets")),
     name="webapp-assets"
 )
 
+# index.html держим в памяти и отдаём с ETag
+index_html = IndexHtmlCache(os.path.join(FRONTEND_DIST, "index.html"))
+
 
 # ==========================
 # 🌍 CORS
@@ -143,61 +186,308 @@ app.add_middleware(
 # ==========================
 # ⚙️ Airtable
 # ==========================
-from services.airtable_client import get_airtable_client
+from services.airtable_client import (
+    get_async_airtable_client,
+    close_async_airtable_client,
+    PRIORITY_INTERACTIVE,
+)
+from services.expert_catalog import get_expert_catalog
+from services.expert_sync import ExpertsDeltaSync, SharedCatalogSync
+from services.catalog_snapshot import get_catalog_snapshot
 
 TABLE_NAME = "Experts"
 
 
+@app.on_event("startup")
+async def precompress_webapp_assets():
+    """Создаём недостающие .br/.gz копии ассетов (после новой сборки фронтенда)"""
+    assets_dir = os.path.join(FRONTEND_DIST, "assets")
+    created = await asyncio.to_thread(precompress_directory, assets_dir)
+    if created:
+        logger.info(f"Precompressed {created} webapp asset variants")
+
+
+@app.on_event("startup")
+async def start_expert_catalog():
+    """
+    Загружаем каталог экспертов и держим его в актуальном состоянии (дельта-синхронизация)
+    Снимок с диска подхватывается до первого запроса, сверка с Airtable — в фоне
+    и только в одном воркере (лидере); остальные получают каталог от него
+    """
+    if BOT_MODE == "webhook":
+        # Каталог синхронизирует движок бота (вместе с уведомлениями о статусах)
+        return
+    sync = ExpertsDeltaSync(get_expert_catalog(), state_file=None, snapshot=get_catalog_snapshot())
+    # Airtable опрашивает один воркер-лидер, остальные берут каталог из общего состояния
+    shared_sync = SharedCatalogSync(sync)
+    sync.warm_start()
+    app.state.catalog_task = asyncio.create_task(shared_sync.run())
+
+
+@app.on_event("startup")
+async def start_bot_webhook():
+    """
+    BOT_MODE=webhook: бот работает в этом же процессе — обновления приходят
+    на секретный путь и обрабатываются общим Dispatcher со всеми роутерами
+    """
+    app.state.bot_webhook = None
+    if BOT_MODE != "webhook":
+        return
+    from bot_app import create_bot, create_dispatcher, start_bot_services
+
+    bot = create_bot()
+    webhook = BotWebhook(bot, create_dispatcher(), webhook_secret())
+    app.state.bot_webhook = webhook
+    app.state.bot_task = start_bot_services(bot)
+    if WEBHOOK_BASE_URL:
+        await webhook.register(WEBHOOK_BASE_URL)
+    else:
+        logger.warning("BOT_MODE=webhook, but WEBHOOK_BASE_URL is not set — webhook is not registered")
+
+
+@app.on_event("shutdown")
+async def shutdown_airtable_client():
+    """Закрываем общую aiohttp-сессию Airtable при остановке сервера"""
+    tasks = [getattr(app.state, name, None) for name in ("catalog_task", "bot_task")]
+    tasks = [task for task in tasks if task is not None]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    webhook = getattr(app.state, "bot_webhook", None)
+    if webhook is not None:
+        await webhook.shutdown()
+        # Отметки Notified пишутся до закрытия клиента, иначе после
+        # перезапуска то же уведомление об одобрении уйдёт повторно
+        from services.status_notifier import close_notified_writes
+        await close_notified_writes()
+    await close_async_airtable_client()
+    await get_photo_cache().close()
+
+
+async def find_expert_by_telegram_id(telegram_id: str):
+    """
+    Ищет запись эксперта по TelegramID: сначала в локальном каталоге,
+    при промахе — в Airtable (найденная запись добавляется в каталог)
+    """
+    catalog = get_expert_catalog()
+    record = catalog.get_by_telegram_id(telegram_id)
+    if record is not None:
+        return record
+
+    client = get_async_airtable_client()
+    formula = f"{{TelegramID}}={telegram_id}"
+    records = await client.get_records(
+        table_name=TABLE_NAME, formula=formula, max_records=1, priority=PRIORITY_INTERACTIVE
+    )
+    if not records:
+        return None
+    catalog.upsert(records[0])
+    return records[0]
+
+
+async def find_expert_by_record_id(record_id: str):
+    """Запись эксперта по id: из локального каталога, при промахе — из Airtable"""
+    catalog = get_expert_catalog()
+    record = catalog.get(record_id)
+    if record is None:
+        client = get_async_airtable_client()
+        record = await client.get_record(
+            table_name=TABLE_NAME, record_id=record_id, priority=PRIORITY_INTERACTIVE
+        )
+        catalog.upsert(record)
+    return record
+
+
+async def find_experts_batch(record_ids: List[str], telegram_ids: List[str]):
+    """
+    Находит экспертов по спискам record id и TelegramID за один проход:
+    сначала локальный каталог, все промахи — одним запросом к Airtable
+    (формула OR(RECORD_ID()=..., {TelegramID}=...))
+
+    Returns:
+        (записи по record id, записи по TelegramID) — только найденные
+    """
+    catalog = get_expert_catalog()
+    by_id = {}
+    by_telegram_id = {}
+    missing_conditions = []
+
+    for record_id in dict.fromkeys(record_ids):
+        record = catalog.get(record_id)
+        if record is not None:
+            by_id[record_id] = record
+        elif RECORD_ID_PATTERN.match(record_id):
+            missing_conditions.append(f"RECORD_ID()='{record_id}'")
+    for telegram_id in dict.fromkeys(telegram_ids):
+        record = catalog.get_by_telegram_id(telegram_id)
+        if record is not None:
+            by_telegram_id[telegram_id] = record
+        elif telegram_id.isdigit():
+            # TelegramID в Airtable — число, без кавычек
+            missing_conditions.append(f"{{TelegramID}}={telegram_id}")
+
+    if missing_conditions:
+        client = get_async_airtable_client()
+        records = await client.get_records(
+            table_name=TABLE_NAME,
+            formula=f"OR({','.join(missing_conditions)})",
+            priority=PRIORITY_INTERACTIVE,
+        )
+        requested_ids = set(record_ids)
+        requested_telegram_ids = set(telegram_ids)
+        for record in records:
+            catalog.upsert(record)
+            if record["id"] in requested_ids:
+                by_id[record["id"]] = record
+            telegram_id = record.get("fields", {}).get("TelegramID")
+            if telegram_id is not None and str(telegram_id) in requested_telegram_ids:
+                by_telegram_id[str(telegram_id)] = record
+
+    return by_id, by_telegram_id
+
+
 # ==========================
 # 📋 Список экспертов
 # ==========================
 @app.get("/api/experts")
-def get_experts(
+async def get_experts(
+    request: Request,
     lang: str | None = Query(None),
     city: str | None = Query(None),
     direction: str | None = Query(None),
+    method: str | None = Query(None),
+    work_format: str | None = Query(None, alias="format"),
+    client_request: str | None = Query(None, alias="request"),
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=50),
+    fields: str | None = Query(None, description='Поля через запятую или "card" — поля карточки галереи'),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы (вместо page)"),
 ):
-    experts = get_approved_experts()
+    try:
+        projection = resolve_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Курсор привязан к фильтрам и проекции запроса
+    filters = filters_key(lang, city, direction, method, work_format, client_request, ",".join(projection or ()))
+    after_id = cursor_version = None
+    if cursor:
+        try:
+            after_id, cursor_version = decode_cursor(cursor, filters)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    content_key, experts = await get_approved_experts_versioned(fields=projection)
+    index = get_search_index(experts, content_key)
+    # Позиции в индексе относятся к его списку (с тем же содержимым)
+    experts = index.experts
+    version = index.fingerprint[:12]
+
+    # ETag по содержимому каталога и параметрам: при совпадении — 304 без поиска и сериализации
+    etag = make_etag(index.fingerprint, filters, cursor or page, limit)
+
+    def build():
+        # Фильтрация по инвертированному индексу: O(совпадений), результат кэшируется в индексе
+        matches = index.search(
+            lang=lang,
+            city=city,
+            direction=direction,
+            method=method,
+            work_format=work_format,
+            client_request=client_request,
+        )
+        total = len(matches)
+
+        if cursor:
+            # Keyset: страница строго после последнего отданного id — O(log n + limit)
+            positions = index.page_after(matches, after_id, limit)
+        else:
+            start = (page - 1) * limit
+            positions = matches[start:start + limit]
+
+        has_more = bool(positions) and positions[-1] != matches[-1]
+        data = {
+            "limit": limit,
+            "total": total,
+            "experts": [project_expert(experts[position], projection) for position in positions],
+            "next_cursor": encode_cursor(index.id_at(positions[-1]), version, filters) if has_more else None,
+            "version": version,
+        }
+        if cursor:
+            # Каталог изменился с первой страницы: порядок тот же, но total/фасеты могли сдвинуться
+            data["catalog_changed"] = cursor_version != version
+        else:
+            data["page"] = page
+            data["pages"] = (total + limit - 1) // limit
+            # Счётчики по значениям фильтров среди найденных (например, "N экспертов в Москве");
+            # только на первой загрузке — страницы по курсору их не пересчитывают
+            data["facets"] = index.total_facets if total == len(experts) else index.facets(matches)
+        return data
+
+    return get_json_responder().respond(request, build, etag=etag)
+
+
+# ==========================
+# 📦 Несколько экспертов одним запросом
+# ==========================
+MAX_BATCH_SIZE = 100
+RECORD_ID_PATTERN = re.compile(r"^rec[A-Za-z0-9]{14}$")
+
+
+class ExpertsBatchRequest(BaseModel):
+    ids: List[str] = []
+    telegram_ids: List[str] = []
+    fields: Optional[str] = None
 
-    if lang:
-        experts = [e for e in experts if e.get("language", "").lower() == lang.lower().strip()]
 
-    if city:
-        experts = [e for e in experts if city.lower().strip() in (e.get("city") or "").lower()]
+@app.post("/api/experts/batch")
+async def get_experts_batch(request: Request, body: ExpertsBatchRequest):
+    """
+    Эксперты по спискам record id и/или TelegramID
+    Вместо N запросов /api/expert и /api/profile — один (и не больше одного к Airtable)
+    """
+    if len(body.ids) + len(body.telegram_ids) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} ids per request")
+    try:
+        projection = resolve_fields(body.fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if projection is not None:
+        # По id и telegram_id клиент сопоставляет ответ с запросом
+        projection = tuple(dict.fromkeys(("id", "telegram_id") + projection))
 
-    if direction:
-        experts = [e for e in experts if direction.lower().strip() in (e.get("direction") or "").lower()]
+    try:
+        by_id, by_telegram_id = await find_experts_batch(body.ids, body.telegram_ids)
+    except Exception as e:
+        logger.error(f"Error fetching experts batch: {e}", exc_info=True)
+        raise HTTPException(status_code=502, detail="Airtable is unavailable")
 
-    total = len(experts)
-    start = (page - 1) * limit
-    end = start + limit
+    def build():
+        records = {record["id"]: record for record in list(by_id.values()) + list(by_telegram_id.values())}
+        return {
+            "experts": [project_expert(format_expert_record(record), projection) for record in records.values()],
+            "missing_ids": [record_id for record_id in body.ids if record_id not in by_id],
+            "missing_telegram_ids": [
+                telegram_id for telegram_id in body.telegram_ids if telegram_id not in by_telegram_id
+            ],
+        }
 
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "pages": (total + limit - 1) // limit,
-        "experts": experts[start:end],
-    }
+    return get_json_responder().respond(request, build)
 
 
 # ==========================
 # 👤 Профиль по Telegram ID
 # ==========================
 @app.get("/api/profile/{telegram_id}")
-def get_profile(telegram_id: str):
+async def get_profile(request: Request, telegram_id: str):
     """Фикс: TelegramID в Airtable — ЧИСЛО → без кавычек"""
     try:
-        client = get_airtable_client()
-        formula = f"{{TelegramID}}={telegram_id}"
-        records = client.get_records(table_name=TABLE_NAME, formula=formula, max_records=1)
+        record = await find_expert_by_telegram_id(telegram_id)
         
-        if not records:
+        if record is None:
             raise HTTPException(status_code=404, detail="Profile not found")
         
-        return format_expert_record(records[0])
+        return get_json_responder().respond(request, lambda: format_expert_record(record))
 
     except HTTPException:
         raise
@@ -212,11 +502,10 @@ def get_profile(telegram_id: str):
 # 🔎 Эксперт по record_id
 # ==========================
 @app.get("/api/expert/{record_id}")
-def get_expert(record_id: str):
+async def get_expert(request: Request, record_id: str):
     try:
-        client = get_airtable_client()
-        record = client.get_record(table_name=TABLE_NAME, record_id=record_id)
-        return format_expert_record(record)
+        record = await find_expert_by_record_id(record_id)
+        return get_json_responder().respond(request, lambda: format_expert_record(record))
     except Exception as e:
         import logging
         logger = logging.getLogger(__name__)
@@ -225,44 +514,46 @@ def get_expert(record_id: str):
 
 
 # ==========================
-# 🧩 Форматирование записи
+# 🖼️ Фото эксперта (прокси с миниатюрами)
 # ==========================
-def format_expert_record(record: dict):
-    fields = record.get("fields", {})
+@app.get("/api/photo/{record_id}")
+async def get_expert_photo(
+    request: Request,
+    record_id: str,
+    size: str = Query(DEFAULT_PHOTO_SIZE),
+    v: str | None = Query(None, description="id вложения — для неизменяемого кэширования"),
+):
+    """
+    Отдаёт фото эксперта из дискового кэша (скачивается и уменьшается один раз)
+    Клиент не видит исходных URL Airtable/Telegram; ссылка с актуальным v= неизменяема
+    """
+    if size not in PHOTO_SIZES:
+        raise HTTPException(status_code=400, detail=f"Unknown size: {size}")
+    if not RECORD_ID_PATTERN.match(record_id):
+        # Заведомо несуществующий id не должен доходить до Airtable
+        raise HTTPException(status_code=404, detail="Expert not found")
+    try:
+        record = await find_expert_by_record_id(record_id)
+    except Exception:
+        raise HTTPException(status_code=404, detail="Expert not found")
 
-    direction = (
-        fields["Direction"][0]
-        if isinstance(fields.get("Direction"), list) and fields["Direction"]
-        else fields.get("Direction")
-    )
+    attachment = photo_attachment(record)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail="Photo not found")
 
-    photo_url = (
-        fields["Photo"][0]["url"]
-        if isinstance(fields.get("Photo"), list) and fields["Photo"]
-        else None
-    )
+    try:
+        path, digest, content_type = await get_photo_cache().get(attachment, size)
+    except Exception as e:
+        logger.warning(f"Could not fetch photo for {record_id}: {e}")
+        raise HTTPException(status_code=502, detail="Photo is unavailable")
 
-    return {
-        "id": record.get("id"),
-        "telegram_id": str(fields.get("TelegramID", "")) if fields.get("TelegramID") is not None else "",
-        "name": fields.get("Name"),
-        "city": fields.get("City"),
-        "language": fields.get("Language", "ru"),
-        "direction": direction,
-        "telegram": fields.get("Telegram"),
-        "photo_url": photo_url,
-        "status": fields.get("Status"),
-        "education": fields.get("Education"),
-        "experience": fields.get("Experience"),
-        "clients": fields.get("Clients"),
-        "average_check": fields.get("AverageCheck"),
-        "audience": fields.get("Audience"),
-        "positioning": fields.get("Positioning"),
-        "methods": fields.get("Methods", []),
-        "formats": fields.get("Format", []),
-        "requests": fields.get("Requests", []),
-        "description": fields.get("Description"),
-    }
+    etag = f'"{digest}"'
+    # Ссылка с v= текущего вложения всегда указывает на одно и то же фото
+    cache_control = IMMUTABLE_CACHE_CONTROL if v and v == attachment.get("id") else "public, max-age=300"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag in (tag.strip() for tag in request.headers.get("if-none-match", "").split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=content_type, headers=headers)
 
 
 # ==========================
@@ -293,9 +584,6 @@ async def request_partnership(request: PartnershipRequest):
                 detail="Partnership request already sent and pending"
             )
         
-        # Получаем информацию о пользователях из Airtable
-        client = get_airtable_client()
-        
         logger.info(f"Looking for users: from={request.from_user_id}, to={request.to_user_id}")
         
         # Проверяем, что это не debug-user
@@ -306,24 +594,23 @@ async def request_partnership(request: PartnershipRequest):
                 detail="Cannot send partnership request from debug mode. Please open the app through Telegram."
             )
         
-        from_formula = f"{{TelegramID}}={request.from_user_id}"
-        to_formula = f"{{TelegramID}}={request.to_user_id}"
+        # Получаем информацию о пользователях (каталог, при промахах — один запрос к Airtable)
+        _, by_telegram_id = await find_experts_batch([], [request.from_user_id, request.to_user_id])
+        from_record = by_telegram_id.get(request.from_user_id)
+        to_record = by_telegram_id.get(request.to_user_id)
         
-        from_records = client.get_records(table_name=TABLE_NAME, formula=from_formula, max_records=1)
-        to_records = client.get_records(table_name=TABLE_NAME, formula=to_formula, max_records=1)
+        logger.info(f"Found records: from={int(from_record is not None)}, to={int(to_record is not None)}")
         
-        logger.info(f"Found records: from={len(from_records) if from_records else 0}, to={len(to_records) if to_records else 0}")
-        
-        if not from_records:
+        if from_record is None:
             logger.error(f"User not found in Airtable: from_user_id={request.from_user_id}")
             raise HTTPException(status_code=404, detail=f"From user not found: {request.from_user_id}")
         
-        if not to_records:
+        if to_record is None:
             logger.error(f"User not found in Airtable: to_user_id={request.to_user_id}")
             raise HTTPException(status_code=404, detail=f"To user not found: {request.to_user_id}")
         
-        from_user = format_expert_record(from_records[0])
-        to_user = format_expert_record(to_records[0])
+        from_user = format_expert_record(from_record)
+        to_user = format_expert_record(to_record)
         
         # Создаем запись о партнерстве
         partnership_id = storage.create_partnership(
@@ -423,6 +710,34 @@ async def request_partnership(request: PartnershipRequest):
         )
 
 
+# ==========================
+# 🤖 Webhook Telegram (BOT_MODE=webhook)
+# ==========================
+@app.post(WEBHOOK_PATH_PREFIX + "{path_token}", include_in_schema=False)
+async def telegram_webhook(request: Request, path_token: str):
+    """Принимает обновление и сразу отвечает; обработка — в фоне с ограничением параллелизма"""
+    webhook = getattr(app.state, "bot_webhook", None)
+    if (
+        webhook is None
+        or request.url.path != webhook.path
+        or not webhook.check_secret(request.headers.get("x-telegram-bot-api-secret-token", ""))
+    ):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not webhook.accept(await request.body()):
+        # Telegram повторит доставку позже
+        raise HTTPException(status_code=503, detail="Too many pending updates")
+    return Response(status_code=200)
+
+
+# ==========================
+# 📈 Метрики (Prometheus)
+# ==========================
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики процесса в текстовом формате Prometheus"""
+    return Response(content=get_metrics_registry().render(), media_type=METRICS_CONTENT_TYPE)
+
+
 # ==========================
 # 🏁 Root
 # ==========================
@@ -437,26 +752,23 @@ def root():
 # ==========================
 @app.get("/webapp")
 @app.get("/webapp/{path:path}")
-async def serve_webapp(path: str = ""):
+async def serve_webapp(request: Request, path: str = ""):
     """
     SPA fallback: отдает index.html для всех маршрутов /webapp/*
     React Router обработает маршрутизацию на клиенте
     Важно для Telegram Mini App: отдаем index.html для всех путей
     """
-    index_path = os.path.join(FRONTEND_DIST, "index.html")
-    if not os.path.exists(index_path):
+    if not index_html.exists():
         return {
             "error": "Frontend not built. Run 'npm run build' in frontend directory.",
-            "path": index_path
+            "path": index_html.path
         }
     # Важно для Telegram Mini App: правильные заголовки
-    return FileResponse(
-        index_path,
-        media_type="text/html",
-        headers={
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0",
+    # no-cache: webview всегда перепроверяет index.html, но получает 304 без тела
+    return index_html.response(
+        request.scope,
+        {
+            "Cache-Control": "no-cache",
             "X-Content-Type-Options": "nosniff",
             "X-Frame-Options": "SAMEORIGIN",
             # Разрешаем загрузку в iframe Telegram
@@ -0,0 +1,41 @@
+"""
+Непрозрачные курсоры для keyset-пагинации /api/experts
+Курсор хранит id последнего отданного эксперта, версию каталога и хеш
+фильтров запроса; следующая страница начинается строго после этого id,
+поэтому новые одобренные эксперты не сдвигают уже загруженные страницы
+"""
+import base64
+import hashlib
+import json
+from typing import Any, Optional, Tuple
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или выдан для других фильтров"""
+
+
+def filters_key(*filters: Any) -> str:
+    """Короткий хеш набора фильтров, к которому привязан курсор"""
+    raw = "\x1f".join("" if value is None else str(value) for value in filters)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def encode_cursor(after_id: str, version: str, filters: str) -> str:
+    payload = json.dumps({"k": after_id, "v": version, "f": filters}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, filters: str) -> Tuple[str, Optional[str]]:
+    """
+    Возвращает (id последнего эксперта, версия каталога на момент выдачи курсора)
+    InvalidCursor — если курсор не разбирается или выдан для других фильтров
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        after_id, version, cursor_filters = payload["k"], payload.get("v"), payload["f"]
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(after_id, str) or cursor_filters != filters:
+        raise InvalidCursor("Cursor does not match the request filters")
+    return after_id, version
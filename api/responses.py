@@ -0,0 +1,157 @@
+"""
+JSON-ответы API со сжатием и условными запросами
+- strong ETag: по версии данных (если известна) или по содержимому тела
+- If-None-Match -> 304 без сериализации и тела
+- brotli (если установлен пакет) или gzip по Accept-Encoding
+- сериализованные и сжатые тела кэшируются по (ETag, кодировка), поэтому
+  повторные одинаковые запросы не сериализуются и не сжимаются заново
+"""
+import gzip
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Меньше этого размера (байты) сжатие не окупается
+MIN_COMPRESS_SIZE = 512
+# Сколько готовых тел хранить в памяти
+BODY_CACHE_SIZE = 256
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong ETag из частей ключа (версия данных, параметры запроса)"""
+    digest = hashlib.sha1("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(","))
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Кодировки из Accept-Encoding с их q-значениями ("gzip;q=0" — запрет gzip)"""
+    accepted: Dict[str, float] = {}
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header: str, available: Tuple[str, ...]) -> Optional[str]:
+    """
+    Лучшая из доступных кодировок (в порядке предпочтения сервера) для Accept-Encoding
+    Выбирается наибольшее q > 0, при равенстве — более ранняя в available;
+    "*" распространяется на кодировки, не названные явно. None — сжатие не принимается
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _choose_encoding(request: Request) -> str:
+    available = ("br", "gzip") if brotli is not None else ("gzip",)
+    return choose_encoding(request.headers.get("accept-encoding", ""), available) or "identity"
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        # Ответ собирается на лету — средний уровень быстрее и почти не хуже 11
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+class JSONResponder:
+    """Собирает JSON-ответы с ETag/304 и сжатием, кэшируя готовые тела"""
+
+    def __init__(self, cache_size: int = BODY_CACHE_SIZE):
+        self.cache_size = cache_size
+        # (etag, кодировка) -> тело
+        self._bodies: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[bytes]:
+        body = self._bodies.get(key)
+        if body is not None:
+            self._bodies.move_to_end(key)
+        return body
+
+    def _store(self, key: Tuple[str, str], body: bytes) -> None:
+        self._bodies[key] = body
+        self._bodies.move_to_end(key)
+        while len(self._bodies) > self.cache_size:
+            self._bodies.popitem(last=False)
+
+    def respond(
+        self,
+        request: Request,
+        build: Callable[[], Any],
+        etag: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        """
+        Ответ с данными build()
+
+        Если etag передан (по версии данных), при совпадении If-None-Match
+        build() не вызывается вовсе; иначе ETag считается по телу.
+        """
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding", **(headers or {})}
+
+        if etag is not None and _etag_matches(request, etag):
+            return Response(status_code=304, headers={**headers, "ETag": etag})
+
+        body = self._cached((etag, "identity")) if etag is not None else None
+        if body is None:
+            body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            if etag is None:
+                etag = make_etag(hashlib.sha1(body).hexdigest())
+                if _etag_matches(request, etag):
+                    return Response(status_code=304, headers={**headers, "ETag": etag})
+            self._store((etag, "identity"), body)
+        headers["ETag"] = etag
+
+        encoding = _choose_encoding(request) if len(body) >= MIN_COMPRESS_SIZE else "identity"
+        if encoding != "identity":
+            encoded = self._cached((etag, encoding))
+            if encoded is None:
+                encoded = _encode(body, encoding)
+                self._store((etag, encoding), encoded)
+            headers["Content-Encoding"] = encoding
+            body = encoded
+
+        return Response(body, media_type="application/json", headers=headers)
+
+
+# Глобальный экземпляр
+_json_responder = JSONResponder()
+
+
+def get_json_responder() -> JSONResponder:
+    """Получает глобальный сборщик JSON-ответов"""
+    return _json_responder
@@ -0,0 +1,188 @@
+"""
+Раздача статики Mini App
+- /webapp/assets/*: файлы с хешем в имени — предсжатые варианты (.br/.gz),
+  Cache-Control immutable и ETag/304 от StaticFiles
+- index.html: хранится в памяти (вместе со сжатой копией), отдаётся с ETag
+  и поддержкой условного GET
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from api.responses import choose_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Хешированные ассеты не меняются — кэшируем на год
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Что имеет смысл сжимать заранее и с какого размера (байты)
+COMPRESSIBLE_EXTENSIONS = (".js", ".css", ".html", ".svg", ".json", ".txt", ".map", ".mjs")
+MIN_COMPRESS_SIZE = 1024
+# Как часто (сек) проверять, не пересобран ли index.html
+INDEX_RECHECK_INTERVAL = 2.0
+
+# Варианты в порядке предпочтения: (Content-Encoding, суффикс файла)
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _accept_encoding(scope: Scope) -> str:
+    return Headers(scope=scope).get("accept-encoding", "")
+
+
+def precompress_directory(directory: str) -> int:
+    """
+    Создаёт .gz (и .br, если установлен пакет brotli) рядом с ассетами,
+    у которых сжатой копии нет или она старше исходника
+    Возвращает количество созданных файлов
+    """
+    created = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_size < MIN_COMPRESS_SIZE:
+                    continue
+                with open(path, "rb") as f:
+                    data = None
+                    for encoding, suffix in ENCODINGS:
+                        if encoding == "br" and brotli is None:
+                            continue
+                        target = path + suffix
+                        if os.path.exists(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                            continue
+                        if data is None:
+                            data = f.read()
+                        compressed = (
+                            brotli.compress(data, quality=11) if encoding == "br"
+                            else gzip.compress(data, compresslevel=9, mtime=0)
+                        )
+                        tmp = target + ".tmp"
+                        with open(tmp, "wb") as out:
+                            out.write(compressed)
+                        os.replace(tmp, target)
+                        created += 1
+            except OSError as e:
+                logger.warning(f"Could not precompress {path}: {e}")
+    return created
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles, отдающий предсжатый вариант файла, если клиент его принимает
+    Наличие вариантов проверяется один раз на путь и запоминается
+    """
+
+    def __init__(self, *args, cache_control: str = IMMUTABLE_CACHE_CONTROL, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = cache_control
+        # путь -> кортеж доступных кодировок
+        self._variants: Dict[str, Tuple[str, ...]] = {}
+
+    def _available_encodings(self, path: str) -> Tuple[str, ...]:
+        variants = self._variants.get(path)
+        if variants is None:
+            variants = tuple(
+                encoding for encoding, suffix in ENCODINGS
+                if self.lookup_path(path + suffix)[1] is not None
+            )
+            self._variants[path] = variants
+        return variants
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        variants = self._available_encodings(path)
+        encoding = choose_encoding(_accept_encoding(scope), variants) if variants else None
+        response = None
+        if encoding is not None:
+            try:
+                response = await super().get_response(path + dict(ENCODINGS)[encoding], scope)
+            except HTTPException:
+                response = None
+        if response is not None:
+            response.headers["Content-Encoding"] = encoding
+            media_type = mimetypes.guess_type(path)[0]
+            if media_type:
+                response.headers["Content-Type"] = media_type
+
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = self.cache_control
+            if variants:
+                response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+class IndexHtmlCache:
+    """
+    index.html SPA в памяти: байты, gzip-копия и ETag
+    Файл перечитывается, только если изменился (проверка mtime не чаще
+    раза в INDEX_RECHECK_INTERVAL секунд)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self.body: Optional[bytes] = None
+        self.gzipped: Optional[bytes] = None
+        self.etag: Optional[str] = None
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self.body is not None and now - self._checked_at < INDEX_RECHECK_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                self._mtime = self.body = self.gzipped = self.etag = None
+                return
+            if mtime == self._mtime:
+                return
+            with open(self.path, "rb") as f:
+                body = f.read()
+            self.gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self.body = body
+            self._mtime = mtime
+
+    def exists(self) -> bool:
+        self._refresh()
+        return self.body is not None
+
+    def response(self, scope: Scope, headers: Dict[str, str]) -> Response:
+        """Ответ с index.html: 304 при совпадении ETag, иначе (сжатое) тело"""
+        self._refresh()
+        request_headers = Headers(scope=scope)
+        headers = {**headers, "ETag": self.etag, "Vary": "Accept-Encoding"}
+
+        if_none_match = request_headers.get("if-none-match", "")
+        if self.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return Response(status_code=304, headers=headers)
+
+        if choose_encoding(request_headers.get("accept-encoding", ""), ("gzip",)):
+            headers["Content-Encoding"] = "gzip"
+            return Response(self.gzipped, media_type="text/html", headers=headers)
+        return Response(self.body, media_type="text/html", headers=headers)
@@ -0,0 +1,156 @@
+"""
+Сборка бота: Bot, Dispatcher с роутерами и фоновые задачи
+Используется и процессом polling (main.py), и API в режиме webhook (api/main.py)
+"""
+import asyncio
+import logging
+from aiogram import Bot, Dispatcher
+
+from config import BOT_TOKEN
+from handlers import start, form, menu_handlers, partnership
+from services.airtable_client import get_async_airtable_client, PRIORITY_BACKGROUND
+from services.airtable_batch import AirtableWriteBuffer
+from services.status_notifier import check_expert_status, create_status_sync
+from services.airtable_api import get_all_table_fields
+from keyboards.main_menu import get_expert_menu
+from middlewares.metrics import setup_handler_metrics
+from middlewares.fsm_snapshot import setup_fsm_snapshot
+from services.fsm_storage import SQLiteStorage
+
+
+# ============================================================
+# 🤖 Bot и Dispatcher
+# ============================================================
+def create_bot() -> Bot:
+    return Bot(token=BOT_TOKEN)
+
+
+def create_dispatcher() -> Dispatcher:
+    """
+    Dispatcher со всеми роутерами
+    Роутер можно подключить только к одному Dispatcher — вызывать один раз на процесс
+    """
+    # 💾 Состояние анкет переживает перезапуск бота
+    storage = SQLiteStorage()
+    dp = Dispatcher(storage=storage)
+    # Несохранённые изменения записываются при остановке polling
+    dp.shutdown.register(storage.close)
+    # 📸 Данные FSM читаются один раз за обновление и записываются одним вызовом
+    setup_fsm_snapshot(dp)
+
+    # ✅ Подключаем все роутеры
+    # 🤝 partnership — обработчик предложений партнерства
+    routers = (
+        ("start", start.router),
+        ("form", form.router),
+        ("menu", menu_handlers.router),
+        ("partnership", partnership.router),
+    )
+    for name, router in routers:
+        dp.include_router(router)
+        # 📈 Замер длительности хендлеров по роутерам
+        setup_handler_metrics(router, name)
+    return dp
+
+
+# ============================================================
+# 📬 Проверка Approved без уведомления и автоуведомление при старте
+# ============================================================
+async def notify_pending_approved(bot: Bot):
+    """
+    Проверяет в Airtable анкеты со статусом Approved и Notified=False
+    и отправляет им уведомление при старте.
+    """
+    try:
+        client = get_async_airtable_client()
+        records = await client.get_records(
+            "Experts",
+            formula="AND({Status}='Approved', NOT({Notified}))",
+            priority=PRIORITY_BACKGROUND
+        )
+        count = len(records)
+
+        if count == 0:
+            logging.info("📭 Все одобренные анкеты уже уведомлены.")
+            return
+
+        logging.info(f"📬 Найдено {count} одобренных анкет без уведомления. Отправляем уведомления...")
+        notified_writes = AirtableWriteBuffer("Experts", client=client, priority=PRIORITY_BACKGROUND)
+
+        for rec in records:
+            fields = rec.get("fields", {})
+            record_id = rec.get("id")
+            # TelegramID в Airtable - Number
+            telegram_id = fields.get("TelegramID")
+            lang = fields.get("Language", "ru")
+
+            if telegram_id is None:
+                continue
+
+            text = (
+                "🎉 Отличные новости!\n\n✅ Ваша анкета одобрена!\nТеперь вы можете заполнить дополнительные данные и участвовать в проектах PAZL Collab 👇"
+                if lang == "ru"
+                else
+                "🎉 Great news!\n\n✅ Your form has been approved!\nNow you can complete your profile and join PAZL Collab projects 👇"
+            )
+
+            try:
+                await bot.send_message(
+                    chat_id=int(telegram_id),
+                    text=text,
+                    reply_markup=get_expert_menu(lang)
+                )
+                await notified_writes.update(record_id, {"Notified": True})
+                logging.info(f"✅ Пользователь {telegram_id} уведомлён при старте.")
+            except Exception as e:
+                logging.error(f"⚠️ Ошибка при уведомлении {telegram_id} при старте: {e}")
+
+        await notified_writes.close()
+        logging.info("📨 Все неуведомлённые Approved-пользователи получили сообщение.")
+
+    except Exception as e:
+        logging.error(f"❌ Ошибка при авто-уведомлении Approved при старте: {e}")
+
+
+# ============================================================
+# 🔗 Проверка подключения к Airtable
+# ============================================================
+async def check_airtable_connection():
+    try:
+        client = get_async_airtable_client()
+        await client.get_records("Experts", max_records=1, priority=PRIORITY_BACKGROUND)
+        logging.info("✅ Airtable подключён успешно")
+    except Exception as e:
+        logging.warning(f"⚠️ Ошибка подключения к Airtable: {e} — используется тестовый режим")
+
+
+# ============================================================
+# 🧵 Фоновые задачи при старте
+# ============================================================
+async def run_background_tasks(bot: Bot, status_sync):
+    """
+    Независимые стартовые проверки выполняются параллельно:
+    подключение к Airtable, обновление списка полей и уведомление Approved.
+    Мониторинг статусов стартует после уведомления, чтобы не дублировать сообщения.
+    """
+    await asyncio.gather(
+        check_airtable_connection(),
+        get_all_table_fields(force_refresh=True),
+        notify_pending_approved(bot),
+    )
+    await check_expert_status(bot, status_sync)
+
+
+# ============================================================
+# 🟢 Запуск фоновых задач бота
+# ============================================================
+def start_bot_services(bot: Bot) -> asyncio.Task:
+    """
+    Тёплый старт каталога из снимка на диске и запуск фоновых задач
+    (стартовые проверки и мониторинг статусов) — не дожидаясь Airtable
+    """
+    status_sync = create_status_sync(bot)
+    status_sync.warm_start()
+    task = asyncio.create_task(run_background_tasks(bot, status_sync))
+    logging.info("🟢 Мониторинг статусов экспертов запущен (каждые 30 сек)")
+    return task
@@ -18,9 +18,32 @@ DEFAULT_PHOTO_URL = os.getenv("DEFAULT_PHOTO_URL", "https://example.com/default.
 # --- WebApp URL ---
 WEBAPP_URL = os.getenv("WEBAPP_URL", "http://localhost:5173")
 
+# --- Публичный адрес API (для абсолютных ссылок на /api/photo) ---
+# Пусто — ссылки относительные (/api/photo/...), Mini App дополняет их адресом VITE_API_URL
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL", "").rstrip("/")
+
+# --- Режим получения обновлений бота ---
+# polling — отдельный процесс main.py; webhook — обновления принимает API (api/main.py)
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL")  # публичный https-адрес API
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")  # пусто — выводится из BOT_TOKEN
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "32"))
+
 # --- Среда (опционально) ---
 ENV = os.getenv("ENV", "dev")
 
+# --- Доля успешных запросов API, попадающих в лог (ошибки логируются всегда) ---
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", "1" if ENV == "dev" else "0.1"))
+
+# --- Порт /metrics процесса бота (в API метрики отдаются на /metrics) ---
+METRICS_PORT = int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None
+
+# --- Общее состояние воркеров API (rate limit, кэш) ---
+# memory — в процессе, sqlite — файл на хосте, redis — сервер по REDIS_URL
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory")
+STATE_DB_PATH = os.getenv("STATE_DB_PATH", "logs/shared_state.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
 # --- Проверка конфигурации ---
 def validate_config():
     """Проверяет наличие всех обязательных переменных окружения"""
@@ -0,0 +1,11 @@
+// Адрес API: Mini App может работать на другом origin, чем API
+export const API_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+
+// Относительные ссылки от API (например, /api/photo/...) строим от адреса API,
+// иначе браузер запросит их у хоста фронтенда
+export function apiAssetUrl(url) {
+  if (typeof url === "string" && url.startsWith("/api/")) {
+    return `${API_URL}${url}`;
+  }
+  return url;
+}
@@ -2,6 +2,7 @@
 import { motion, AnimatePresence, useMotionValue, useTransform } from "framer-motion";
 import { useNavigate } from "react-router-dom";
 import VisionAvatar from "./VisionAvatar";
+import { apiAssetUrl } from "../apiUrl";
 
 export default function SwipeCards({ experts }) {
   const [index, setIndex] = useState(0);
@@ -24,7 +25,7 @@ export default function SwipeCards({ experts }) {
   // ⭐ Предзагрузка следующего фото
   if (next?.photo_url) {
     const prefetchImg = new Image();
-    prefetchImg.src = next.photo_url;
+    prefetchImg.src = apiAssetUrl(next.photo_url);
   }
 
   // Порог свайпа
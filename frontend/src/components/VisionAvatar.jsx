@@ -1,4 +1,5 @@
 import React from "react";
+import { apiAssetUrl } from "../apiUrl";
 
 export default function VisionAvatar({ src, size = 120 }) {
   return (
@@ -35,7 +36,7 @@ export default function VisionAvatar({ src, size = 120 }) {
 
       {/*  */}
       <img
-        src={src || "/default-avatar.jpg"}
+        src={apiAssetUrl(src) || "/default-avatar.jpg"}
         alt="avatar"
         className="relative z-10 w-full h-full object-cover rounded-full"
       />
@@ -13,7 +13,7 @@ export default function Gallery() {
   const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
   useEffect(() => {
-    fetch(`${API_URL}/api/experts`)
+    fetch(`${API_URL}/api/experts?fields=card`)
       .then((res) => {
         if (!res.ok) {
           throw new Error(`HTTP error! status: ${res.status}`);
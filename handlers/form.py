@@ -5,7 +5,10 @@ from colorama import Fore, init
 from pyairtable.formulas import match
 
 from states.form_states import FormStates
-from services.airtable_api import create_expert_record, get_table
+from services.airtable_api import create_expert_record
+from services.airtable_client import get_async_airtable_client, PRIORITY_INTERACTIVE
+from services.expert_catalog import get_expert_catalog
+from services.keyboard_edits import get_keyboard_edits
 from services.utils import (
     validate_text_input, 
     get_photo_url,
@@ -75,14 +78,24 @@ def get_skip_keyboard(lang="ru"):
 # ==========================
 async def check_existing_form(telegram_id: int):
     """Проверяет, есть ли у пользователя анкета, и форматирует дату красиво."""
-    table = get_table()
+    catalog = get_expert_catalog()
     try:
-        # TelegramID в Airtable - Number, передаем как число
-        records = table.all(formula=match({"TelegramID": telegram_id}))
-        if not records:
+        if catalog.ready:
+            # Каталог синхронизирован с Airtable — ищем локально, без запроса
+            record = catalog.get_by_telegram_id(telegram_id)
+        else:
+            client = get_async_airtable_client()
+            # TelegramID в Airtable - Number, передаем как число
+            records = await client.get_records(
+                "Experts",
+                formula=match({"TelegramID": telegram_id}),
+                max_records=1,
+                priority=PRIORITY_INTERACTIVE
+            )
+            record = records[0] if records else None
+        if record is None:
             return None
 
-        record = records[0]
         raw_date = record["fields"].get("Date", "—")
 
         # 🔹 Форматируем дату
@@ -194,15 +207,13 @@ async def check_form_status(message: Message, state: FSMContext):
 
         # 🟢 Отмечаем в Airtable, что пользователь уведомлён вручную
         try:
-            from services.airtable_api import get_table
-            from pyairtable.formulas import match
-            table = get_table()
-            # TelegramID в Airtable - Number, передаем как число
-            records = table.all(formula=match({"TelegramID": message.from_user.id}))
-            if records:
-                record_id = records[0]["id"]
-                table.update(record_id, {"Notified": True})
-                print(f"✅ [Manual Notify] Пользователь {message.from_user.id} отмечен как уведомлён (ручная проверка).")
+            client = get_async_airtable_client()
+            # record id уже известен из check_existing_form — повторный поиск не нужен
+            record_id = result["id"]
+            await client.update_record(
+                "Experts", record_id, {"Notified": True}, priority=PRIORITY_INTERACTIVE
+            )
+            print(f"✅ [Manual Notify] Пользователь {message.from_user.id} отмечен как уведомлён (ручная проверка).")
         except Exception as e:
             print(f"⚠️ Ошибка при обновлении Notified вручную ({message.from_user.id}): {e}")
 
@@ -400,6 +411,7 @@ async def process_main_direction_callback(callback: CallbackQuery, state: FSMCon
             await callback.answer("Выберите хотя бы один вариант!" if lang == "ru" else "Select at least one option!", show_alert=True)
             return
         if "other" in selected:
+            get_keyboard_edits().cancel(callback.message)
             await callback.message.edit_text("Укажите другое направление:" if lang == "ru" else "Specify other direction:")
             await state.set_state(FormStates.waiting_for_main_direction_other)
             return
@@ -410,6 +422,7 @@ async def process_main_direction_callback(callback: CallbackQuery, state: FSMCon
                 "Additional methods and tools (multiple choice):"
             )
             keyboard = get_methods_keyboard(lang, [])
+            get_keyboard_edits().cancel(callback.message)
             await callback.message.edit_text(text, reply_markup=keyboard)
             await state.set_state(FormStates.waiting_for_additional_methods)
     else:
@@ -419,7 +432,7 @@ async def process_main_direction_callback(callback: CallbackQuery, state: FSMCon
             selected.append(value)
         await state.update_data(main_direction=selected)
         keyboard = get_main_direction_keyboard(lang, selected)
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
+        get_keyboard_edits().schedule(callback.message, keyboard)
     await callback.answer()
 
 
@@ -466,6 +479,7 @@ async def process_additional_methods_callback(callback: CallbackQuery, state: FS
     if value == "done":
         text = "Базовое образование:" if lang == "ru" else "Basic education:"
         keyboard = get_education_keyboard(lang)
+        get_keyboard_edits().cancel(callback.message)
         await callback.message.edit_text(text, reply_markup=keyboard)
         await state.set_state(FormStates.waiting_for_education)
     else:
@@ -475,7 +489,7 @@ async def process_additional_methods_callback(callback: CallbackQuery, state: FS
             selected.append(value)
         await state.update_data(additional_methods=selected)
         keyboard = get_methods_keyboard(lang, selected)
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
+        get_keyboard_edits().schedule(callback.message, keyboard)
     await callback.answer()
 # ==========================
 # 💼 Блок 3: Формат и практика
@@ -530,6 +544,7 @@ async def process_work_format_callback(callback: CallbackQuery, state: FSMContex
             return
         text = "Среднее количество клиентов в месяц:" if lang == "ru" else "Average number of clients per month:"
         keyboard = get_clients_count_keyboard(lang)
+        get_keyboard_edits().cancel(callback.message)
         await callback.message.edit_text(text, reply_markup=keyboard)
         await state.set_state(FormStates.waiting_for_clients)
     else:
@@ -539,7 +554,7 @@ async def process_work_format_callback(callback: CallbackQuery, state: FSMContex
             selected.append(value)
         await state.update_data(work_formats=selected)
         keyboard = get_work_format_keyboard(lang, selected)
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
+        get_keyboard_edits().schedule(callback.message, keyboard)
     await callback.answer()
 
 
@@ -601,6 +616,7 @@ async def process_client_requests_callback(callback: CallbackQuery, state: FSMCo
             if lang == "ru"
             else "👥 BLOCK 4: TARGET AUDIENCE\n\nDescribe your target audience: gender, age, status, income, geography (1–2 sentences):"
         )
+        get_keyboard_edits().cancel(callback.message)
         await callback.message.edit_text(text)
         await state.set_state(FormStates.waiting_for_audience)
     else:
@@ -613,7 +629,7 @@ async def process_client_requests_callback(callback: CallbackQuery, state: FSMCo
             selected.append(value)
         await state.update_data(client_requests=selected)
         keyboard = get_client_requests_keyboard(lang, selected)
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
+        get_keyboard_edits().schedule(callback.message, keyboard)
     await callback.answer()
 
 
@@ -3,6 +3,9 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 import logging
 from config import BOT_TOKEN
 import aiohttp
+from pyairtable.formulas import match
+from services.airtable_client import get_async_airtable_client, PRIORITY_INTERACTIVE
+from services.expert_catalog import get_expert_catalog
 from services.partnership_storage import get_partnership_storage, PartnershipStatus
 
 router = Router()
@@ -115,14 +118,28 @@ async def handle_partnership_callback(callback: types.CallbackQuery):
 
 
 async def get_user_info(telegram_id: str):
-    """Получает информацию о пользователе из Airtable"""
+    """
+    Получает информацию об одобренном эксперте
+    Из локального каталога, пока он не загружен — из Airtable
+    """
     try:
-        from api.airtable_service import get_approved_experts
-        experts = get_approved_experts()
-        for expert in experts:
-            if expert.get("telegram_id") == str(telegram_id):
-                return expert
-        return None
+        from api.airtable_service import format_expert_record, APPROVED_STATUSES
+        catalog = get_expert_catalog()
+        if catalog.ready:
+            record = catalog.get_by_telegram_id(telegram_id)
+        else:
+            client = get_async_airtable_client()
+            # TelegramID в Airtable - Number, передаем как число
+            records = await client.get_records(
+                "Experts",
+                formula=match({"TelegramID": int(telegram_id)}),
+                max_records=1,
+                priority=PRIORITY_INTERACTIVE
+            )
+            record = records[0] if records else None
+        if record is None or record.get("fields", {}).get("Status") not in APPROVED_STATUSES:
+            return None
+        return format_expert_record(record)
     except Exception as e:
         logging.error(f"Ошибка получения информации о пользователе: {e}")
         return None
@@ -1,20 +1,10 @@
-from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
 
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-# ============================================================
-# 🔧 Базовая функция для мультивыбора
-# ============================================================
-def create_multiselect_keyboard(options: list, callback_prefix: str, selected: list = None, show_done: bool = True):
-    if selected is None:
-        selected = []
-    keyboard = []
-    for text, value in options:
-        display_text = f"✅ {text}" if value in selected else text
-        callback_data = f"{callback_prefix}:{value}"
-        keyboard.append([InlineKeyboardButton(text=display_text, callback_data=callback_data)])
-    if show_done:
-        keyboard.append([InlineKeyboardButton(text="✅ Готово", callback_data=f"{callback_prefix}:done")])
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+# Сколько готовых клавиатур (шаг, язык, выбор) держать в памяти
+KEYBOARD_CACHE_SIZE = 1024
 
 
 # ============================================================
@@ -247,44 +237,105 @@ CLIENT_REQUESTS_OPTIONS_EN = [
 ]
 
 
+# ============================================================
+# 🧱 Шаблоны клавиатур
+# ============================================================
+class KeyboardTemplate:
+    """
+    Клавиатура шага анкеты, собранная заранее
+    Обе версии каждой кнопки (с ✅ и без) создаются один раз, выбор
+    кодируется битовой маской по порядку вариантов
+    """
+
+    def __init__(self, options: list, callback_prefix: str, show_done: bool = True):
+        self._bits: Dict[str, int] = {value: 1 << i for i, (_, value) in enumerate(options)}
+        self._buttons: Tuple[Tuple[InlineKeyboardButton, InlineKeyboardButton], ...] = tuple(
+            (
+                InlineKeyboardButton(text=text, callback_data=f"{callback_prefix}:{value}"),
+                InlineKeyboardButton(text=f"✅ {text}", callback_data=f"{callback_prefix}:{value}"),
+            )
+            for text, value in options
+        )
+        self._done_row = (
+            [InlineKeyboardButton(text="✅ Готово", callback_data=f"{callback_prefix}:done")]
+            if show_done else None
+        )
+
+    def mask(self, selected: Iterable[str]) -> int:
+        """Битовая маска выбранных вариантов (неизвестные значения не отмечаются)"""
+        mask = 0
+        for value in selected or ():
+            mask |= self._bits.get(value, 0)
+        return mask
+
+    def render(self, mask: int) -> InlineKeyboardMarkup:
+        keyboard = [[checked if mask >> i & 1 else plain] for i, (plain, checked) in enumerate(self._buttons)]
+        if self._done_row is not None:
+            keyboard.append(self._done_row)
+        return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+_TEMPLATE_SPECS = (
+    ("main_direction", MAIN_DIRECTION_OPTIONS_RU, MAIN_DIRECTION_OPTIONS_EN, True),
+    ("additional_methods", ADDITIONAL_METHODS_OPTIONS_RU, ADDITIONAL_METHODS_OPTIONS_EN, True),
+    ("education", EDUCATION_OPTIONS_RU, EDUCATION_OPTIONS_EN, False),
+    ("experience", EXPERIENCE_OPTIONS_RU, EXPERIENCE_OPTIONS_EN, False),
+    ("work_format", WORK_FORMAT_OPTIONS_RU, WORK_FORMAT_OPTIONS_EN, True),
+    ("clients_count", CLIENTS_COUNT_OPTIONS_RU, CLIENTS_COUNT_OPTIONS_EN, False),
+    ("avg_check", AVERAGE_CHECK_OPTIONS_RU, AVERAGE_CHECK_OPTIONS_EN, False),
+    ("client_requests", CLIENT_REQUESTS_OPTIONS_RU, CLIENT_REQUESTS_OPTIONS_EN, True),
+)
+
+# (префикс, язык) -> шаблон; собираются один раз при импорте
+KEYBOARD_TEMPLATES: Dict[Tuple[str, str], KeyboardTemplate] = {
+    (prefix, lang): KeyboardTemplate(options, prefix, show_done)
+    for prefix, options_ru, options_en, show_done in _TEMPLATE_SPECS
+    for lang, options in (("ru", options_ru), ("en", options_en))
+}
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def _render_keyboard(prefix: str, lang: str, mask: int) -> InlineKeyboardMarkup:
+    # Готовые клавиатуры общие для всех пользователей — не изменять
+    return KEYBOARD_TEMPLATES[(prefix, lang)].render(mask)
+
+
+def get_form_keyboard(prefix: str, lang: str, selected=None) -> InlineKeyboardMarkup:
+    """Клавиатура шага анкеты с отмеченным выбором (из кэша, если уже собиралась)"""
+    lang = "en" if lang == "en" else "ru"
+    return _render_keyboard(prefix, lang, KEYBOARD_TEMPLATES[(prefix, lang)].mask(selected))
+
+
 # ============================================================
 # 🔸 Генераторы клавиатур
 # ============================================================
 def get_main_direction_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        MAIN_DIRECTION_OPTIONS_EN if lang == 'en' else MAIN_DIRECTION_OPTIONS_RU, "main_direction", selected or [])
+    return get_form_keyboard("main_direction", lang, selected)
 
 
 def get_methods_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        ADDITIONAL_METHODS_OPTIONS_EN if lang == 'en' else ADDITIONAL_METHODS_OPTIONS_RU, "additional_methods", selected or [])
+    return get_form_keyboard("additional_methods", lang, selected)
 
 
 def get_education_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        EDUCATION_OPTIONS_EN if lang == 'en' else EDUCATION_OPTIONS_RU, "education", selected or [], show_done=False)
+    return get_form_keyboard("education", lang, selected)
 
 
 def get_experience_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        EXPERIENCE_OPTIONS_EN if lang == 'en' else EXPERIENCE_OPTIONS_RU, "experience", selected or [], show_done=False)
+    return get_form_keyboard("experience", lang, selected)
 
 
 def get_work_format_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        WORK_FORMAT_OPTIONS_EN if lang == 'en' else WORK_FORMAT_OPTIONS_RU, "work_format", selected or [])
+    return get_form_keyboard("work_format", lang, selected)
 
 
 def get_clients_count_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        CLIENTS_COUNT_OPTIONS_EN if lang == 'en' else CLIENTS_COUNT_OPTIONS_RU, "clients_count", selected or [], show_done=False)
+    return get_form_keyboard("clients_count", lang, selected)
 
 
 def get_average_check_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        AVERAGE_CHECK_OPTIONS_EN if lang == 'en' else AVERAGE_CHECK_OPTIONS_RU, "avg_check", selected or [], show_done=False)
+    return get_form_keyboard("avg_check", lang, selected)
 
 
 def get_client_requests_keyboard(lang, selected=None):
-    return create_multiselect_keyboard(
-        CLIENT_REQUESTS_OPTIONS_EN if lang == 'en' else CLIENT_REQUESTS_OPTIONS_RU, "client_requests", selected or [])
+    return get_form_keyboard("client_requests", lang, selected)
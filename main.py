@@ -1,67 +1,11 @@
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from pyairtable import Table
 
-from config import BOT_TOKEN, AIRTABLE_API_KEY, AIRTABLE_BASE_ID
-from handlers import start, form, menu_handlers
-from services.airtable_api import get_table
-from services.status_notifier import check_expert_status
-from keyboards.main_menu import get_expert_menu
-
-
-# ============================================================
-# 📬 Проверка Approved без уведомления и автоуведомление при старте
-# ============================================================
-async def notify_pending_approved(bot: Bot):
-    """
-    Проверяет в Airtable анкеты со статусом Approved и Notified=False
-    и отправляет им уведомление при старте.
-    """
-    try:
-        table = Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, "Experts")
-        records = table.all(formula="AND({Status}='Approved', NOT({Notified}))")
-        count = len(records)
-
-        if count == 0:
-            logging.info("📭 Все одобренные анкеты уже уведомлены.")
-            return
-
-        logging.info(f"📬 Найдено {count} одобренных анкет без уведомления. Отправляем уведомления...")
-
-        for rec in records:
-            fields = rec.get("fields", {})
-            record_id = rec.get("id")
-            # TelegramID в Airtable - Number
-            telegram_id = fields.get("TelegramID")
-            lang = fields.get("Language", "ru")
-
-            if telegram_id is None:
-                continue
-
-            text = (
-                "🎉 Отличные новости!\n\n✅ Ваша анкета одобрена!\nТеперь вы можете заполнить дополнительные данные и участвовать в проектах PAZL Collab 👇"
-                if lang == "ru"
-                else
-                "🎉 Great news!\n\n✅ Your form has been approved!\nNow you can complete your profile and join PAZL Collab projects 👇"
-            )
-
-            try:
-                await bot.send_message(
-                    chat_id=int(telegram_id),
-                    text=text,
-                    reply_markup=get_expert_menu(lang)
-                )
-                table.update(record_id, {"Notified": True})
-                logging.info(f"✅ Пользователь {telegram_id} уведомлён при старте.")
-            except Exception as e:
-                logging.error(f"⚠️ Ошибка при уведомлении {telegram_id} при старте: {e}")
-
-        logging.info("📨 Все неуведомлённые Approved-пользователи получили сообщение.")
-
-    except Exception as e:
-        logging.error(f"❌ Ошибка при авто-уведомлении Approved при старте: {e}")
+from config import METRICS_PORT, BOT_MODE
+from services.airtable_client import close_async_airtable_client
+from services.status_notifier import close_notified_writes
+from services.metrics import start_metrics_server
+from bot_app import create_bot, create_dispatcher, start_bot_services
 
 
 # ============================================================
@@ -86,48 +30,45 @@ async def main():
     
     logging.info("🚀 PAZL Collab Bot v1.0 запущен")
 
-    bot = Bot(token=BOT_TOKEN)
-    storage = MemoryStorage()
-    dp = Dispatcher(storage=storage)
-
-    # ✅ Подключаем все роутеры
-    dp.include_router(start.router)
-    dp.include_router(form.router)
-    dp.include_router(menu_handlers.router)
-    
-    # 🤝 Обработчик предложений партнерства
-    from handlers import partnership
-    dp.include_router(partnership.router)
-
-    # ============================================================
-    # 🔗 Проверка подключения к Airtable
-    # ============================================================
-    try:
-        table = get_table()
-        table.all(max_records=1)
-        logging.info("✅ Airtable подключён успешно")
-    except Exception as e:
-        logging.warning(f"⚠️ Ошибка подключения к Airtable: {e} — используется тестовый режим")
+    if BOT_MODE == "webhook":
+        logging.info("🌐 BOT_MODE=webhook: обновления принимает API (uvicorn api.main:app), polling не запускается")
+        return
 
-    # ============================================================
-    # 📬 Проверка Approved без уведомления и отправка при старте
-    # ============================================================
-    await notify_pending_approved(bot)
+    bot = create_bot()
+    dp = create_dispatcher()
 
     # ============================================================
-    # 🟢 Фоновая проверка статусов экспертов
+    # 💾 Тёплый старт каталога и фоновые задачи — polling запускается сразу
     # ============================================================
+    services_task = None
     try:
-        asyncio.create_task(check_expert_status(bot))
-        logging.info("🟢 Мониторинг статусов экспертов запущен (каждые 30 мин)")
+        services_task = start_bot_services(bot)
     except Exception as e:
         logging.error(f"❌ Ошибка при запуске фоновой проверки статусов: {e}")
 
     # ============================================================
     # 🔁 Запуск Telegram polling
     # ============================================================
+    metrics_runner = None
+    if METRICS_PORT:
+        try:
+            metrics_runner = await start_metrics_server(METRICS_PORT)
+        except Exception as e:
+            logging.warning(f"⚠️ Не удалось запустить /metrics на порту {METRICS_PORT}: {e}")
+
     logging.info("🤖 Подключение к Telegram API...")
-    await dp.start_polling(bot)
+    try:
+        # Webhook, оставшийся от режима webhook, мешает getUpdates
+        await bot.delete_webhook(drop_pending_updates=False)
+        await dp.start_polling(bot)
+    finally:
+        if services_task is not None:
+            services_task.cancel()
+            await asyncio.gather(services_task, return_exceptions=True)
+        await close_notified_writes()
+        await close_async_airtable_client()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 # ============================================================
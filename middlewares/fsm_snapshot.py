@@ -0,0 +1,104 @@
+"""
+Снимок данных FSM на время обработки одного обновления
+Данные читаются из хранилища один раз при первом обращении, дальнейшие
+get_data/update_data работают со снимком в памяти, а изменения записываются
+одним update_data (или set_data после clear/set_data) после хендлера
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import BaseStorage, StorageKey
+from aiogram.types import TelegramObject
+
+
+class BufferedFSMContext(FSMContext):
+    """FSMContext, накапливающий изменения данных до commit()"""
+
+    def __init__(self, storage: BaseStorage, key: StorageKey):
+        super().__init__(storage=storage, key=key)
+        self._data: Optional[Dict[str, Any]] = None
+        self._changed: Set[str] = set()
+        # Данные заменены целиком (set_data/clear) — записываем через set_data
+        self._replaced = False
+
+    async def _snapshot(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+        return self._data
+
+    async def get_data(self) -> Dict[str, Any]:
+        return (await self._snapshot()).copy()
+
+    async def set_data(self, data: Dict[str, Any]) -> None:
+        self._data = dict(data)
+        self._changed.clear()
+        self._replaced = True
+
+    async def update_data(self, data: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Dict[str, Any]:
+        if data:
+            kwargs.update(data)
+        snapshot = await self._snapshot()
+        snapshot.update(kwargs)
+        self._changed.update(kwargs)
+        return snapshot.copy()
+
+    async def commit(self) -> None:
+        """Записывает накопленные изменения в хранилище одним вызовом"""
+        if self._replaced:
+            await self.storage.set_data(key=self.key, data=self._data)
+        elif self._changed:
+            changes = {name: self._data[name] for name in self._changed}
+            await self.storage.update_data(key=self.key, data=changes)
+        self._changed.clear()
+        self._replaced = False
+
+
+class FSMSnapshotMiddleware(BaseMiddleware):
+    """
+    Подменяет state хендлера на BufferedFSMContext и сохраняет изменения после него
+    Обновления одного пользователя (одного StorageKey) обрабатываются по очереди:
+    снимок живёт всё время работы хендлера, и без блокировки два быстрых нажатия
+    прочитали бы одни данные и затёрли изменения друг друга
+    """
+
+    def __init__(self):
+        # StorageKey -> [блокировка, сколько обновлений её держат или ждут]
+        self._locks: Dict[StorageKey, list] = {}
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        state = data.get("state")
+        if state is None or isinstance(state, BufferedFSMContext):
+            return await handler(event, data)
+
+        entry = self._locks.get(state.key)
+        if entry is None:
+            entry = self._locks[state.key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                buffered = BufferedFSMContext(storage=state.storage, key=state.key)
+                data["state"] = buffered
+                try:
+                    return await handler(event, data)
+                finally:
+                    # Изменения, сделанные до ошибки, сохраняются, как и без снимка
+                    await buffered.commit()
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                # Блокировки неактивных пользователей не накапливаются
+                del self._locks[state.key]
+
+
+def setup_fsm_snapshot(dispatcher: Dispatcher) -> None:
+    """Подключает снимок FSM к сообщениям и callback-запросам всех роутеров"""
+    middleware = FSMSnapshotMiddleware()
+    dispatcher.message.outer_middleware(middleware)
+    dispatcher.callback_query.outer_middleware(middleware)
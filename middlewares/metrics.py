@@ -0,0 +1,47 @@
+"""
+Метрики обработчиков бота
+Inner-middleware роутера вызывается только когда фильтры хендлера совпали,
+поэтому замер — это время работы хендлера этого роутера
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Router
+from aiogram.types import TelegramObject
+
+from services.metrics import get_metrics_registry
+
+HANDLER_LATENCY = get_metrics_registry().histogram(
+    "bot_handler_duration_seconds",
+    "aiogram handler latency by router, update type and outcome",
+    ("router", "event", "status")
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Замеряет длительность хендлеров роутера"""
+
+    def __init__(self, router_name: str, event_type: str):
+        self.router_name = router_name
+        self.event_type = event_type
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, self.router_name, self.event_type, status)
+
+
+def setup_handler_metrics(router: Router, name: str) -> None:
+    """Подключает замер хендлеров сообщений и callback-запросов роутера"""
+    router.message.middleware(HandlerMetricsMiddleware(name, "message"))
+    router.callback_query.middleware(HandlerMetricsMiddleware(name, "callback_query"))
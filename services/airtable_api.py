@@ -1,5 +1,4 @@
 import asyncio
-import requests
 import csv
 import os
 from datetime import datetime
@@ -7,6 +6,9 @@ from pyairtable import Table
 from aiogram import Bot
 from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID, BOT_TOKEN
 from services.status_notifier import notify_new_expert  # 📢 уведомление в канал
+from services.airtable_client import get_async_airtable_client, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from services.expert_catalog import get_expert_catalog
+from services.catalog_snapshot import get_catalog_snapshot
 
 # ==========================
 # 🎓 Education
@@ -247,21 +249,26 @@ def get_table(table_name="Experts"):
     return Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, table_name)
 
 
-def get_all_table_fields(force_refresh=False):
+async def get_all_table_fields(force_refresh=False, priority=PRIORITY_BACKGROUND):
     global _cached_fields
     if _cached_fields and not force_refresh:
         return _cached_fields
 
-    url = f"https://api.airtable.com/v0/meta/bases/{AIRTABLE_BASE_ID}/tables"
-    headers = {"Authorization": f"Bearer {AIRTABLE_API_KEY}"}
+    # 💾 Поля из снимка на диске — без запроса к Airtable после перезапуска
+    if not force_refresh:
+        stored_fields = await asyncio.to_thread(get_catalog_snapshot().get_meta, "table_fields")
+        if stored_fields:
+            _cached_fields = stored_fields
+            return _cached_fields
+
+    # Metadata API — через общий клиент и throttler, как и остальные запросы к базе
     try:
-        r = requests.get(url, headers=headers, timeout=10)
-        if r.status_code == 200:
-            data = r.json()
-            for t in data.get("tables", []):
-                if t["name"] == "Experts":
-                    _cached_fields = [f["name"] for f in t["fields"]]
-                    return _cached_fields
+        tables = await get_async_airtable_client().get_tables(priority=priority)
+        for t in tables:
+            if t["name"] == "Experts":
+                _cached_fields = [f["name"] for f in t["fields"]]
+                await asyncio.to_thread(get_catalog_snapshot().set_meta, "table_fields", _cached_fields)
+                return _cached_fields
     except Exception as e:
         print(f"⚠️ Ошибка при получении полей Airtable: {e}")
     return []
@@ -301,12 +308,13 @@ def log_record_to_csv(record_id, name, lang, telegram_id):
 # 📤 Create record in Airtable
 # ==========================
 async def create_expert_record(data: dict):
-    table = get_table()
-    available = get_all_table_fields()
+    client = get_async_airtable_client()
+    available = await get_all_table_fields()
     lang = data.get("lang", "ru")
 
     if not available:
-        available = get_all_table_fields(force_refresh=True)
+        # Пользователь ждёт завершения анкеты
+        available = await get_all_table_fields(force_refresh=True, priority=PRIORITY_INTERACTIVE)
 
     airtable_data = {
         "Name": data.get("name", ""),
@@ -421,8 +429,10 @@ async def create_expert_record(data: dict):
     print("📤 Отправляем в Airtable:", airtable_data)
 
     try:
-        record = await asyncio.to_thread(table.create, airtable_data)
+        record = await client.create_record("Experts", airtable_data, priority=PRIORITY_INTERACTIVE)
         record_id = record["id"]
+        # Сразу добавляем анкету в локальный каталог (повторная проверка её увидит)
+        get_expert_catalog().upsert(record)
         print(f"✅ Новая запись создана в Airtable ({lang}): {record_id}")
 
         log_record_to_csv(
@@ -479,10 +489,11 @@ STATUS_MAPPING = {
 
 
 async def update_expert_status(expert_id: str, status: str):
-    table = get_table()
+    client = get_async_airtable_client()
     try:
         normalized_status = STATUS_MAPPING.get(status, status)
-        table.update(expert_id, {"Status": normalized_status})
+        record = await client.update_record("Experts", expert_id, {"Status": normalized_status})
+        get_expert_catalog().upsert(record)
         print(f"✅ Статус обновлён: {normalized_status}")
         return True
     except Exception as e:
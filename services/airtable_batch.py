@@ -0,0 +1,160 @@
+"""
+Отложенная пакетная запись в Airtable (write-behind)
+Изменения копятся в буфере и уходят пачками по 10 записей:
+при заполнении пачки или по таймауту
+"""
+import asyncio
+import logging
+from typing import Optional, Dict, Any, List
+
+from services.airtable_client import (
+    AsyncAirtableClient,
+    get_async_airtable_client,
+    BATCH_SIZE,
+    PRIORITY_BACKGROUND,
+)
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2.0  # секунды до принудительной отправки неполной пачки
+MAX_RETRY_DELAY = 60.0  # предел паузы между повторами после ошибок записи
+
+
+class AirtableWriteBuffer:
+    """Буфер изменений одной таблицы с отправкой через batch_create / batch_update"""
+    
+    def __init__(
+        self,
+        table_name: str,
+        client: Optional[AsyncAirtableClient] = None,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        priority: int = PRIORITY_BACKGROUND
+    ):
+        self.table_name = table_name
+        self._client = client
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.priority = priority
+        # Обновления одной записи склеиваются: в Airtable уйдёт итоговый набор полей
+        self._updates: Dict[str, Dict[str, Any]] = {}
+        self._creates: List[Dict[str, Any]] = []
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._timer_sleeping = False
+        # Пауза до повтора после неудачной отправки; удваивается при каждой ошибке подряд
+        self._retry_delay = 0.0
+        self._closing = False
+    
+    @property
+    def client(self) -> AsyncAirtableClient:
+        return self._client or get_async_airtable_client()
+    
+    def pending(self) -> int:
+        """Количество изменений, ожидающих отправки"""
+        return len(self._updates) + len(self._creates)
+    
+    async def update(self, record_id: str, fields: Dict[str, Any]) -> None:
+        """Ставит обновление записи в очередь"""
+        self._updates.setdefault(record_id, {}).update(fields)
+        await self._after_add()
+    
+    async def create(self, fields: Dict[str, Any]) -> None:
+        """Ставит создание записи в очередь"""
+        self._creates.append(dict(fields))
+        await self._after_add()
+    
+    async def _after_add(self) -> None:
+        if len(self._updates) >= self.batch_size or len(self._creates) >= self.batch_size:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+    
+    async def _flush_later(self, delay: Optional[float] = None) -> None:
+        self._timer_sleeping = True
+        try:
+            await asyncio.sleep(self.flush_interval if delay is None else delay)
+        finally:
+            self._timer_sleeping = False
+        await self.flush()
+    
+    def _requeue(self, updates: List[Dict[str, Any]], creates: List[Dict[str, Any]]) -> None:
+        """Возвращает неотправленное в буфер, не затирая более новые изменения"""
+        for update in updates:
+            self._updates[update["id"]] = {**update["fields"], **self._updates.get(update["id"], {})}
+        self._creates = creates + self._creates
+    
+    async def flush(self) -> None:
+        """
+        Отправляет все накопленные изменения пачками
+        Пачка, которую не удалось отправить, и все следующие за ней
+        возвращаются в буфер; повторная отправка планируется сама,
+        с растущей паузой, пока ошибки продолжаются
+        """
+        async with self._lock:
+            failed = False
+            updates = [{"id": rid, "fields": f} for rid, f in self._updates.items()]
+            creates = self._creates
+            self._updates = {}
+            self._creates = []
+            
+            for start in range(0, len(updates), self.batch_size):
+                chunk = updates[start:start + self.batch_size]
+                try:
+                    await self.client.batch_update(self.table_name, chunk, priority=self.priority)
+                    logger.info(f"Flushed {len(chunk)} updates to {self.table_name}")
+                except asyncio.CancelledError:
+                    # Остановка посреди отправки: неотправленное остаётся для close()
+                    self._requeue(updates[start:], creates)
+                    raise
+                except Exception as e:
+                    logger.error(f"Error flushing {len(chunk)} updates to {self.table_name}, will retry: {e}")
+                    self._requeue(updates[start:], [])
+                    failed = True
+                    break
+            
+            for start in range(0, len(creates), self.batch_size):
+                chunk = creates[start:start + self.batch_size]
+                try:
+                    await self.client.batch_create(self.table_name, chunk, priority=self.priority)
+                    logger.info(f"Flushed {len(chunk)} new records to {self.table_name}")
+                except asyncio.CancelledError:
+                    self._requeue([], creates[start:])
+                    raise
+                except Exception as e:
+                    logger.error(f"Error flushing {len(chunk)} new records to {self.table_name}, will retry: {e}")
+                    self._requeue([], creates[start:])
+                    failed = True
+                    break
+            
+            if failed:
+                self._schedule_retry()
+            else:
+                self._retry_delay = 0.0
+    
+    def _schedule_retry(self) -> None:
+        """Планирует повтор после ошибки, если отправка ещё не запланирована"""
+        if self._closing:
+            return
+        self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), MAX_RETRY_DELAY)
+        timer = self._timer
+        if timer is None or timer.done() or timer is asyncio.current_task():
+            self._timer = asyncio.create_task(self._flush_later(self._retry_delay))
+    
+    async def close(self) -> None:
+        """
+        Отправляет остаток буфера
+        Таймер отменяется, только пока он ждёт; уже начатая отправка дожидается.
+        RuntimeError — если часть изменений так и не удалось записать
+        """
+        self._closing = True
+        timer = self._timer
+        self._timer = None
+        if timer is not None and not timer.done() and timer is not asyncio.current_task():
+            if self._timer_sleeping:
+                timer.cancel()
+            else:
+                await timer
+        await self.flush()
+        if self.pending():
+            raise RuntimeError(f"{self.pending()} changes to {self.table_name} were not written")
@@ -3,25 +3,189 @@
 - Retry с exponential backoff
 - Обработка rate limits
 - Кэширование
+- Асинхронный клиент на общей aiohttp-сессии (keep-alive пул соединений)
+- Проактивное ограничение частоты (token bucket с приоритетами)
+- Объединение одинаковых одновременных чтений (single-flight)
 """
 import asyncio
+import heapq
+import itertools
 import logging
 import time
-from typing import Optional, Dict, Any, List
-import requests
+from typing import Optional, Dict, Any, List, Tuple, AsyncIterator
+import aiohttp
 from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID
+from services.singleflight import SingleFlight
+from services.metrics import get_metrics_registry
 
 logger = logging.getLogger(__name__)
 
+# Задержка каждой HTTP-попытки к Airtable (без ожидания throttler'а)
+AIRTABLE_LATENCY = get_metrics_registry().histogram(
+    "airtable_request_duration_seconds",
+    "Airtable API request latency by method, table and response status",
+    ("method", "table", "status")
+)
+
+
+def _observe_request(
+    method: str,
+    endpoint: str,
+    status: str,
+    started: float,
+    finished: Optional[float] = None
+) -> None:
+    table = endpoint.split("/", 1)[0]
+    elapsed = (finished or time.perf_counter()) - started
+    AIRTABLE_LATENCY.observe(elapsed, method.upper(), table, status)
+
+
 # Константы для retry
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 1  # секунды
 MAX_BACKOFF = 10  # секунды
 RATE_LIMIT_WAIT = 30  # секунды при 429 ошибке
+REQUEST_TIMEOUT = 10  # секунды на один HTTP запрос
+
+# Пул соединений для асинхронного клиента
+POOL_SIZE = 20  # максимум одновременных соединений
+KEEPALIVE_TIMEOUT = 60  # секунды жизни простаивающего соединения
 
+# Пагинация: Airtable отдаёт не более 100 записей на страницу
+MAX_PAGE_SIZE = 100
 
-class AirtableClient:
-    """Клиент для работы с Airtable API с retry и обработкой ошибок"""
+# Пакетная запись: Airtable принимает не более 10 записей за один запрос
+BATCH_SIZE = 10
+
+# Лимит Airtable: 5 запросов в секунду на базу
+RATE_LIMIT_PER_SECOND = 5
+RATE_LIMIT_BURST = 5  # сколько запросов можно отправить подряд без ожидания
+
+# Приоритеты очереди запросов (меньше — раньше)
+PRIORITY_INTERACTIVE = 0  # пользователь ждёт ответа (профиль, анкета, партнёрство)
+PRIORITY_DEFAULT = 5
+PRIORITY_BACKGROUND = 10  # фоновый опрос статусов и служебные проверки
+
+
+class AirtableThrottler:
+    """
+    Token bucket для исходящих запросов к одной базе Airtable
+    - общий на процесс: все клиенты одной базы делят один лимит
+    - запросы сверх лимита ждут в очереди с приоритетами,
+      пользовательские запросы обслуживаются раньше фоновых
+    - после 429 выдача токенов приостанавливается для всех
+    """
+    
+    def __init__(self, rate: float = RATE_LIMIT_PER_SECOND, burst: int = RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+    
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+    
+    def _try_take(self, now: float) -> bool:
+        if now < self._blocked_until:
+            return False
+        self._refill(now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+    
+    async def acquire(self, priority: int = PRIORITY_DEFAULT) -> None:
+        """Ждёт разрешения на отправку одного запроса"""
+        if not self._waiters and self._try_take(time.monotonic()):
+            return
+        
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), waiter))
+        self._schedule(loop)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Токен уже был выдан, но запрос отменён — возвращаем токен
+                self._tokens = min(self.burst, self._tokens + 1)
+            raise
+    
+    def pause(self, seconds: float) -> None:
+        """Приостанавливает выдачу токенов (например, после ответа 429)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+    
+    def _schedule(self, loop: asyncio.AbstractEventLoop) -> None:
+        if self._timer is not None or not self._waiters:
+            return
+        now = time.monotonic()
+        self._refill(now)
+        delay = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0)
+        self._timer = loop.call_later(delay, self._dispatch, loop)
+    
+    def _dispatch(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._timer = None
+        now = time.monotonic()
+        while self._waiters:
+            waiter = self._waiters[0][2]
+            if waiter.done():
+                # Ожидающий отменён — просто убираем из очереди
+                heapq.heappop(self._waiters)
+                continue
+            if not self._try_take(now):
+                break
+            heapq.heappop(self._waiters)
+            waiter.set_result(None)
+        self._schedule(loop)
+
+
+# Один throttler на базу Airtable в пределах процесса
+_throttlers: Dict[str, AirtableThrottler] = {}
+
+
+def get_throttler(base_id: str) -> AirtableThrottler:
+    """Получает общий throttler для базы Airtable"""
+    throttler = _throttlers.get(base_id)
+    if throttler is None:
+        throttler = AirtableThrottler()
+        _throttlers[base_id] = throttler
+    return throttler
+
+
+def _encode_params(params: Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """
+    Приводит параметры запроса к списку пар для aiohttp
+    (списки раскрываются в повторяющиеся ключи, как ожидает Airtable)
+    """
+    encoded: List[Tuple[str, str]] = []
+    for key, value in (params or {}).items():
+        if value is None:
+            continue
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            if isinstance(item, bool):
+                item = "true" if item else "false"
+            encoded.append((key, str(item)))
+    return encoded
+
+
+class AsyncAirtableClient:
+    """
+    Асинхронный клиент Airtable API
+    - одна общая aiohttp.ClientSession с пулом keep-alive соединений
+    - неблокирующий backoff через asyncio.sleep (event loop не простаивает при 429)
+    - все запросы проходят через общий для базы AirtableThrottler
+    - одинаковые одновременные get_records/get_record выполняются одним запросом
+    - методы-корутины с параметром priority (очередь throttler'а)
+    """
     
     def __init__(self, base_id: str = None, api_key: str = None):
         self.base_id = base_id or AIRTABLE_BASE_ID
@@ -31,97 +195,166 @@ class AirtableClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._throttler = get_throttler(self.base_id)
+        self._reads = SingleFlight()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает общую сессию, создавая её при первом обращении"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=POOL_SIZE,
+                keepalive_timeout=KEEPALIVE_TIMEOUT
+            )
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+            )
+        return self._session
     
-    def _make_request(
+    async def close(self) -> None:
+        """Закрывает сессию и освобождает соединения пула"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _make_request(
         self,
         method: str,
         endpoint: str,
         params: Optional[Dict] = None,
         json_data: Optional[Dict] = None,
-        retry_count: int = 0
-    ) -> requests.Response:
+        priority: int = PRIORITY_DEFAULT,
+        base_url: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
-        Выполняет HTTP запрос с retry и обработкой ошибок
+        Выполняет HTTP запрос с retry и обработкой ошибок, возвращает JSON ответа
+        Каждая попытка сначала получает токен у throttler'а базы
+        base_url — для запросов вне данных базы (Metadata API)
         """
-        url = f"{self.base_url}/{endpoint}"
+        method = method.upper()
+        if method not in ("GET", "POST", "PATCH", "PUT", "DELETE"):
+            raise ValueError(f"Unsupported HTTP method: {method}")
         
-        try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers, params=params, timeout=10)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=json_data, params=params, timeout=10)
-            elif method.upper() == "PATCH":
-                response = requests.patch(url, headers=self.headers, json=json_data, params=params, timeout=10)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=self.headers, json=json_data, params=params, timeout=10)
-            elif method.upper() == "DELETE":
-                response = requests.delete(url, headers=self.headers, params=params, timeout=10)
-            else:
-                raise ValueError(f"Unsupported HTTP method: {method}")
+        url = f"{base_url or self.base_url}/{endpoint}"
+        session = self._get_session()
+        retry_count = 0
+        
+        while True:
+            await self._throttler.acquire(priority)
+            started = time.perf_counter()
+            outcome = "error"
+            finished = None  # конец попытки без учёта паузы перед повтором
+            try:
+                async with session.request(
+                    method,
+                    url,
+                    params=_encode_params(params),
+                    json=json_data
+                ) as response:
+                    outcome = str(response.status)
+                    # Обработка rate limit (429)
+                    if response.status == 429:
+                        retry_after = int(response.headers.get("Retry-After", RATE_LIMIT_WAIT))
+                        logger.warning(f"Rate limit hit. Waiting {retry_after} seconds...")
+                        # Останавливаем все запросы к базе, а не только этот
+                        self._throttler.pause(retry_after)
+                        
+                        if retry_count < MAX_RETRIES:
+                            retry_count += 1
+                            continue
+                        response.raise_for_status()
+                    
+                    # Обработка временных ошибок (5xx)
+                    if 500 <= response.status < 600:
+                        if retry_count < MAX_RETRIES:
+                            backoff = min(INITIAL_BACKOFF * (2 ** retry_count), MAX_BACKOFF)
+                            logger.warning(
+                                f"Server error {response.status}. "
+                                f"Retrying in {backoff} seconds... (attempt {retry_count + 1}/{MAX_RETRIES})"
+                            )
+                            retry_count += 1
+                            finished = time.perf_counter()
+                            await asyncio.sleep(backoff)
+                            continue
+                        response.raise_for_status()
+                    
+                    # Обработка других ошибок
+                    if not response.ok:
+                        body = await response.text()
+                        logger.error(f"Airtable API error {response.status}: {body[:500]}")
+                        response.raise_for_status()
+                    
+                    return await response.json()
             
-            # Обработка rate limit (429)
-            if response.status_code == 429:
-                retry_after = int(response.headers.get("Retry-After", RATE_LIMIT_WAIT))
-                logger.warning(f"Rate limit hit. Waiting {retry_after} seconds...")
-                
+            except asyncio.TimeoutError:
+                outcome = "timeout"
                 if retry_count < MAX_RETRIES:
-                    time.sleep(retry_after)
-                    return self._make_request(method, endpoint, params, json_data, retry_count + 1)
-                else:
-                    response.raise_for_status()
+                    backoff = min(INITIAL_BACKOFF * (2 ** retry_count), MAX_BACKOFF)
+                    logger.warning(f"Request timeout. Retrying in {backoff} seconds...")
+                    retry_count += 1
+                    finished = time.perf_counter()
+                    await asyncio.sleep(backoff)
+                    continue
+                raise Exception("Request timeout after multiple retries")
             
-            # Обработка временных ошибок (5xx)
-            if 500 <= response.status_code < 600:
+            except aiohttp.ClientConnectionError:
+                outcome = "connection_error"
                 if retry_count < MAX_RETRIES:
                     backoff = min(INITIAL_BACKOFF * (2 ** retry_count), MAX_BACKOFF)
-                    logger.warning(
-                        f"Server error {response.status_code}. "
-                        f"Retrying in {backoff} seconds... (attempt {retry_count + 1}/{MAX_RETRIES})"
-                    )
-                    time.sleep(backoff)
-                    return self._make_request(method, endpoint, params, json_data, retry_count + 1)
-                else:
-                    response.raise_for_status()
-            
-            # Обработка других ошибок
-            if not response.ok:
-                response.raise_for_status()
+                    logger.warning(f"Connection error. Retrying in {backoff} seconds...")
+                    retry_count += 1
+                    finished = time.perf_counter()
+                    await asyncio.sleep(backoff)
+                    continue
+                raise Exception("Connection error after multiple retries")
             
-            return response
+            except aiohttp.ClientResponseError as e:
+                logger.error(f"Airtable API error: {e}")
+                raise
             
-        except requests.exceptions.Timeout:
-            if retry_count < MAX_RETRIES:
-                backoff = min(INITIAL_BACKOFF * (2 ** retry_count), MAX_BACKOFF)
-                logger.warning(f"Request timeout. Retrying in {backoff} seconds...")
-                time.sleep(backoff)
-                return self._make_request(method, endpoint, params, json_data, retry_count + 1)
-            else:
-                raise Exception("Request timeout after multiple retries")
-        
-        except requests.exceptions.ConnectionError:
-            if retry_count < MAX_RETRIES:
-                backoff = min(INITIAL_BACKOFF * (2 ** retry_count), MAX_BACKOFF)
-                logger.warning(f"Connection error. Retrying in {backoff} seconds...")
-                time.sleep(backoff)
-                return self._make_request(method, endpoint, params, json_data, retry_count + 1)
-            else:
-                raise Exception("Connection error after multiple retries")
-        
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Airtable API error: {e}")
-            raise
+            finally:
+                _observe_request(method, endpoint, outcome, started, finished)
     
-    def get_records(
+    async def get_records(
         self,
         table_name: str,
         formula: Optional[str] = None,
         max_records: Optional[int] = None,
-        fields: Optional[List[str]] = None
+        fields: Optional[List[str]] = None,
+        priority: int = PRIORITY_DEFAULT
     ) -> List[Dict[str, Any]]:
         """
-        Получает записи из таблицы
+        Получает записи из таблицы (все страницы, с учётом max_records)
+        Одновременные вызовы с теми же параметрами получают общий результат
+        """
+        async def fetch() -> List[Dict[str, Any]]:
+            records: List[Dict[str, Any]] = []
+            async for record in self.iter_records(
+                table_name, formula=formula, fields=fields,
+                max_records=max_records, priority=priority
+            ):
+                records.append(record)
+            return records
+        
+        key = ("records", table_name, formula, tuple(fields) if fields else None, max_records)
+        return await self._reads.do(key, fetch)
+    
+    async def iter_pages(
+        self,
+        table_name: str,
+        formula: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        page_size: int = MAX_PAGE_SIZE,
+        max_records: Optional[int] = None,
+        priority: int = PRIORITY_DEFAULT
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Лениво отдаёт страницы записей, следуя курсору offset
+        (следующая страница запрашивается только когда нужна вызывающему коду)
         """
-        params = {}
+        params: Dict[str, Any] = {"pageSize": max(1, min(page_size, MAX_PAGE_SIZE))}
         if formula:
             params["filterByFormula"] = formula
         if max_records:
@@ -129,42 +362,143 @@ class AirtableClient:
         if fields:
             params["fields[]"] = fields
         
-        response = self._make_request("GET", table_name, params=params)
-        data = response.json()
-        return data.get("records", [])
+        while True:
+            data = await self._make_request("GET", table_name, params=params, priority=priority)
+            records = data.get("records", [])
+            if records:
+                yield records
+            offset = data.get("offset")
+            if not offset:
+                return
+            params["offset"] = offset
+    
+    async def iter_records(
+        self,
+        table_name: str,
+        formula: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        page_size: int = MAX_PAGE_SIZE,
+        max_records: Optional[int] = None,
+        priority: int = PRIORITY_DEFAULT
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоково отдаёт все записи таблицы по одной, страница за страницей
+        (в памяти одновременно не больше одной страницы)
+        """
+        async for page in self.iter_pages(
+            table_name, formula=formula, fields=fields,
+            page_size=page_size, max_records=max_records, priority=priority
+        ):
+            for record in page:
+                yield record
     
-    def get_record(self, table_name: str, record_id: str) -> Dict[str, Any]:
+    async def get_tables(self, priority: int = PRIORITY_DEFAULT) -> List[Dict[str, Any]]:
+        """
+        Схема таблиц базы (Metadata API): [{"name": ..., "fields": [...]}, ...]
+        """
+        data = await self._reads.do(
+            ("tables",),
+            lambda: self._make_request(
+                "GET",
+                "tables",
+                priority=priority,
+                base_url=f"https://api.airtable.com/v0/meta/bases/{self.base_id}"
+            )
+        )
+        return data.get("tables", [])
+    
+    async def get_record(
+        self,
+        table_name: str,
+        record_id: str,
+        priority: int = PRIORITY_DEFAULT
+    ) -> Dict[str, Any]:
         """
         Получает одну запись по ID
         """
-        response = self._make_request("GET", f"{table_name}/{record_id}")
-        return response.json()
+        return await self._reads.do(
+            ("record", table_name, record_id),
+            lambda: self._make_request("GET", f"{table_name}/{record_id}", priority=priority)
+        )
     
-    def create_record(self, table_name: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    async def create_record(
+        self,
+        table_name: str,
+        fields: Dict[str, Any],
+        priority: int = PRIORITY_DEFAULT
+    ) -> Dict[str, Any]:
         """
         Создает новую запись
         """
         json_data = {"fields": fields}
-        response = self._make_request("POST", table_name, json_data=json_data)
-        return response.json()
+        return await self._make_request("POST", table_name, json_data=json_data, priority=priority)
     
-    def update_record(self, table_name: str, record_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    async def update_record(
+        self,
+        table_name: str,
+        record_id: str,
+        fields: Dict[str, Any],
+        priority: int = PRIORITY_DEFAULT
+    ) -> Dict[str, Any]:
         """
         Обновляет запись
         """
         json_data = {"fields": fields}
-        response = self._make_request("PATCH", f"{table_name}/{record_id}", json_data=json_data)
-        return response.json()
+        return await self._make_request(
+            "PATCH", f"{table_name}/{record_id}", json_data=json_data, priority=priority
+        )
+    
+    async def batch_create(
+        self,
+        table_name: str,
+        records_fields: List[Dict[str, Any]],
+        priority: int = PRIORITY_DEFAULT
+    ) -> List[Dict[str, Any]]:
+        """
+        Создает записи пачками по BATCH_SIZE (один HTTP запрос на пачку)
+        """
+        created: List[Dict[str, Any]] = []
+        for start in range(0, len(records_fields), BATCH_SIZE):
+            chunk = records_fields[start:start + BATCH_SIZE]
+            json_data = {"records": [{"fields": fields} for fields in chunk]}
+            data = await self._make_request("POST", table_name, json_data=json_data, priority=priority)
+            created.extend(data.get("records", []))
+        return created
+    
+    async def batch_update(
+        self,
+        table_name: str,
+        updates: List[Dict[str, Any]],
+        priority: int = PRIORITY_DEFAULT
+    ) -> List[Dict[str, Any]]:
+        """
+        Обновляет записи пачками по BATCH_SIZE
+        
+        Args:
+            updates: список вида [{"id": record_id, "fields": {...}}, ...]
+        """
+        updated: List[Dict[str, Any]] = []
+        for start in range(0, len(updates), BATCH_SIZE):
+            chunk = updates[start:start + BATCH_SIZE]
+            json_data = {"records": [{"id": u["id"], "fields": u["fields"]} for u in chunk]}
+            data = await self._make_request("PATCH", table_name, json_data=json_data, priority=priority)
+            updated.extend(data.get("records", []))
+        return updated
 
 
 # Глобальный экземпляр клиента
-_airtable_client = None
+_async_airtable_client = None
+
 
+def get_async_airtable_client() -> AsyncAirtableClient:
+    """Получает глобальный экземпляр асинхронного клиента Airtable"""
+    global _async_airtable_client
+    if _async_airtable_client is None:
+        _async_airtable_client = AsyncAirtableClient()
+    return _async_airtable_client
 
-def get_airtable_client() -> AirtableClient:
-    """Получает глобальный экземпляр клиента Airtable"""
-    global _airtable_client
-    if _airtable_client is None:
-        _airtable_client = AirtableClient()
-    return _airtable_client
 
+async def close_async_airtable_client() -> None:
+    """Закрывает сессию глобального асинхронного клиента (при остановке приложения)"""
+    if _async_airtable_client is not None:
+        await _async_airtable_client.close()
@@ -1,33 +1,69 @@
 """
-Простое in-memory кэширование с TTL
+Простое кэширование с TTL
+Поддерживает stale-while-revalidate: после мягкого TTL значение ещё отдаётся
+сразу, а обновление идёт в фоне; после жёсткого TTL — ждём загрузку
+Записи хранятся в бэкенде общего состояния (services.shared_state), поэтому
+при нескольких воркерах кэш и фоновое обновление общие для всех
 """
+import asyncio
+import logging
 import time
-from typing import Optional, Any, Dict
+from typing import Optional, Any, Dict, Callable, Awaitable
 from datetime import datetime, timedelta
 
+from services.shared_state import StateBackend, get_state_backend
+from services.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+# Обращения к кэшу: hit (свежее), stale (устаревшее, обновляется в фоне), miss
+CACHE_REQUESTS = get_metrics_registry().counter(
+    "cache_requests_total",
+    "Cache lookups by key and result",
+    ("key", "result")
+)
+
+
+# Префиксы ключей кэша и блокировок фонового обновления в бэкенде
+KEY_PREFIX = "cache:"
+LOCK_PREFIX = "cache-lock:"
+# Сколько секунд блокировка обновления держится, если воркер упал
+REFRESH_LOCK_TTL = 60
+
 
 class Cache:
     """Простой кэш с TTL (Time To Live)"""
     
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, backend: Optional[StateBackend] = None):
+        self._backend = backend
+        # Фоновые обновления устаревших записей (не больше одного на ключ)
+        self._refreshing: Dict[str, asyncio.Task] = {}
     
-    def get(self, key: str) -> Optional[Any]:
-        """Получает значение из кэша, если оно не истекло"""
-        if key not in self._cache:
+    @property
+    def backend(self) -> StateBackend:
+        if self._backend is None:
+            self._backend = get_state_backend()
+        return self._backend
+    
+    async def _entry(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = await self.backend.get(KEY_PREFIX + key)
+        if entry is None:
             return None
-        
-        entry = self._cache[key]
         expires_at = entry.get("expires_at")
-        
         if expires_at and time.time() > expires_at:
-            # Истекло, удаляем
-            del self._cache[key]
             return None
-        
+        return entry
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Получает значение из кэша, если оно не истекло"""
+        entry = await self._entry(key)
+        if entry is None:
+            CACHE_REQUESTS.inc(key, "miss")
+            return None
+        CACHE_REQUESTS.inc(key, "hit")
         return entry.get("value")
     
-    def set(self, key: str, value: Any, ttl: int = 300) -> None:
+    async def set(self, key: str, value: Any, ttl: int = 300, stale_ttl: int = 0) -> Dict[str, Any]:
         """
         Сохраняет значение в кэш с TTL
         
@@ -35,36 +71,120 @@ class Cache:
             key: Ключ кэша
             value: Значение для кэширования
             ttl: Time to live в секундах (по умолчанию 5 минут)
+            stale_ttl: Сколько секунд после ttl значение ещё можно отдавать
+                как устаревшее (пока идёт фоновое обновление)
         """
-        expires_at = time.time() + ttl
-        self._cache[key] = {
+        now = time.time()
+        entry = {
             "value": value,
-            "expires_at": expires_at,
-            "created_at": time.time()
+            "stale_at": now + ttl,
+            "expires_at": now + ttl + stale_ttl,
+            "created_at": now
         }
+        # Бэкенд удалит запись сам после жёсткого TTL
+        await self.backend.set(KEY_PREFIX + key, entry, ttl=ttl + stale_ttl)
+        return entry
+    
+    async def is_stale(self, key: str) -> bool:
+        """Истёк ли мягкий TTL записи (запись есть, но её пора обновить)"""
+        entry = await self._entry(key)
+        if entry is None:
+            return False
+        stale_at = entry.get("stale_at")
+        return bool(stale_at) and time.time() > stale_at
     
-    def delete(self, key: str) -> None:
+    async def get_or_refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        stale_ttl: int = 0
+    ) -> Any:
+        """
+        Возвращает значение по ключу, загружая его через loader при необходимости
+        
+        - свежее значение возвращается сразу
+        - устаревшее (мягкий TTL истёк, жёсткий ещё нет) возвращается сразу,
+          а loader запускается в фоне
+        - если значения нет или истёк жёсткий TTL — ждём loader
+        """
+        entry = await self.get_or_refresh_entry(key, loader, ttl=ttl, stale_ttl=stale_ttl)
+        return entry["value"]
+    
+    async def get_or_refresh_entry(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        stale_ttl: int = 0
+    ) -> Dict[str, Any]:
+        """
+        То же, что get_or_refresh, но возвращает запись целиком
+        created_at записи одинаков во всех воркерах и меняется только при
+        загрузке нового значения — по нему можно кэшировать производные данные
+        """
+        entry = await self._entry(key)
+        if entry is not None and entry.get("value") is not None:
+            stale_at = entry.get("stale_at")
+            if stale_at and time.time() > stale_at:
+                CACHE_REQUESTS.inc(key, "stale")
+                await self._schedule_refresh(key, loader, ttl, stale_ttl)
+            else:
+                CACHE_REQUESTS.inc(key, "hit")
+            return entry
+        
+        CACHE_REQUESTS.inc(key, "miss")
+        value = await loader()
+        return await self.set(key, value, ttl=ttl, stale_ttl=stale_ttl)
+    
+    async def _schedule_refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int
+    ) -> None:
+        task = self._refreshing.get(key)
+        if task is not None and not task.done():
+            return
+        # Обновляет только один воркер; остальные отдают устаревшее значение
+        if not await self.backend.add(LOCK_PREFIX + key, 1, ttl=REFRESH_LOCK_TTL):
+            return
+        self._refreshing[key] = asyncio.create_task(self._refresh(key, loader, ttl, stale_ttl))
+    
+    async def _refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        stale_ttl: int
+    ) -> None:
+        try:
+            value = await loader()
+            await self.set(key, value, ttl=ttl, stale_ttl=stale_ttl)
+            logger.debug(f"Cache key '{key}' refreshed in background")
+        except Exception as e:
+            # Оставляем устаревшее значение до жёсткого TTL
+            logger.error(f"Background refresh of cache key '{key}' failed: {e}")
+        finally:
+            self._refreshing.pop(key, None)
+            await self.backend.delete(LOCK_PREFIX + key)
+    
+    async def delete(self, key: str) -> None:
         """Удаляет значение из кэша"""
-        if key in self._cache:
-            del self._cache[key]
+        await self.backend.delete(KEY_PREFIX + key)
     
-    def clear(self) -> None:
+    async def clear(self) -> None:
         """Очищает весь кэш"""
-        self._cache.clear()
+        await self.backend.delete_prefix(KEY_PREFIX)
     
-    def cleanup_expired(self) -> None:
+    async def cleanup_expired(self) -> None:
         """Удаляет все истекшие записи"""
-        now = time.time()
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if entry.get("expires_at") and entry["expires_at"] < now
-        ]
-        for key in expired_keys:
-            del self._cache[key]
+        await self.backend.purge_expired()
     
-    def size(self) -> int:
+    async def size(self) -> int:
         """Возвращает количество записей в кэше"""
-        return len(self._cache)
+        return await self.backend.count(KEY_PREFIX)
 
 
 # Глобальный экземпляр кэша
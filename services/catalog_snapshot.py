@@ -0,0 +1,119 @@
+"""
+Снимок каталога экспертов на диске (SQLite)
+Записи таблицы Experts, отметка синхронизации и метаданные полей
+сохраняются локально, поэтому после перезапуска каталог доступен
+сразу, а сверка с Airtable идёт в фоне
+"""
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional, Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "logs/experts_catalog.db"
+
+
+class CatalogSnapshot:
+    """Хранилище снимка каталога: таблицы records(id, data) и meta(key, value)"""
+    
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        self.path = path
+        self._initialized = False
+    
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            # WAL: API и бот могут читать снимок, пока другой процесс его пишет
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS records (id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            conn.commit()
+            self._initialized = True
+        return conn
+    
+    def load(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Возвращает (записи, метаданные); пустой результат, если снимка нет"""
+        if not os.path.exists(self.path):
+            return [], {}
+        try:
+            conn = self._connect()
+            try:
+                records = [json.loads(data) for (data,) in conn.execute("SELECT data FROM records")]
+                meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+            finally:
+                conn.close()
+            return records, meta
+        except Exception as e:
+            logger.warning(f"Could not load catalog snapshot from {self.path}: {e}")
+            return [], {}
+    
+    def save(self, records: List[Dict[str, Any]], watermark: Optional[str]) -> None:
+        """Полностью заменяет записи снимка и отметку синхронизации (одна транзакция)"""
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM records")
+                    conn.executemany(
+                        "INSERT INTO records (id, data) VALUES (?, ?)",
+                        [
+                            (record["id"], json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                            for record in records
+                        ]
+                    )
+                    self._set_meta(conn, "watermark", watermark)
+                    self._set_meta(conn, "saved_at", time.time())
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Could not save catalog snapshot to {self.path}: {e}")
+    
+    def get_meta(self, key: str) -> Optional[Any]:
+        """Значение метаданных по ключу"""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+            finally:
+                conn.close()
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            logger.warning(f"Could not read '{key}' from catalog snapshot: {e}")
+            return None
+    
+    def set_meta(self, key: str, value: Any) -> None:
+        """Сохраняет значение метаданных"""
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    self._set_meta(conn, key, value)
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Could not write '{key}' to catalog snapshot: {e}")
+    
+    @staticmethod
+    def _set_meta(conn: sqlite3.Connection, key: str, value: Any) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            (key, json.dumps(value, ensure_ascii=False))
+        )
+
+
+# Глобальный экземпляр снимка
+_catalog_snapshot = None
+
+
+def get_catalog_snapshot() -> CatalogSnapshot:
+    """Получает глобальный экземпляр снимка каталога"""
+    global _catalog_snapshot
+    if _catalog_snapshot is None:
+        _catalog_snapshot = CatalogSnapshot()
+    return _catalog_snapshot
@@ -0,0 +1,119 @@
+"""
+Локальный каталог экспертов
+Таблица Experts целиком хранится в памяти с хэш-индексами
+(record id, TelegramID), поэтому поиск одного эксперта
+не требует запроса к Airtable
+Актуальность поддерживает services.expert_sync (дельта-синхронизация)
+"""
+from typing import Optional, Dict, Any, List
+
+TABLE_NAME = "Experts"
+
+
+def _normalize(value: Any) -> str:
+    return str(value).strip().lower() if value is not None else ""
+
+
+class ExpertCatalog:
+    """In-memory копия таблицы Experts с индексами для O(1) поиска"""
+    
+    def __init__(self, table_name: str = TABLE_NAME):
+        self.table_name = table_name
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._by_telegram_id: Dict[str, str] = {}
+        # Растёт при каждом изменении содержимого каталога
+        self.version = 0
+        self.loaded_at: Optional[float] = None
+    
+    @property
+    def ready(self) -> bool:
+        """Каталог хотя бы раз загружен из Airtable"""
+        return self.loaded_at is not None
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    # ==========================
+    # 🔎 Поиск
+    # ==========================
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Запись по record id"""
+        return self._records.get(record_id)
+    
+    def get_by_telegram_id(self, telegram_id: Any) -> Optional[Dict[str, Any]]:
+        """Запись по TelegramID"""
+        record_id = self._by_telegram_id.get(_normalize(telegram_id))
+        return self._records.get(record_id) if record_id else None
+    
+    def all(self) -> List[Dict[str, Any]]:
+        """Все записи каталога"""
+        return list(self._records.values())
+    
+    # ==========================
+    # ✏️ Изменения
+    # ==========================
+    def upsert(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Добавляет или заменяет запись, возвращает предыдущую версию
+        Запись с теми же полями не меняет каталог
+        """
+        record_id = record.get("id")
+        if not record_id:
+            return None
+        
+        previous = self._records.get(record_id)
+        if previous is not None:
+            if previous.get("fields") == record.get("fields"):
+                return previous
+            self._unindex(previous)
+        
+        self._records[record_id] = record
+        self._index(record)
+        self.version += 1
+        return previous
+    
+    def remove(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Удаляет запись, возвращает удалённую"""
+        previous = self._records.pop(record_id, None)
+        if previous is not None:
+            self._unindex(previous)
+            self.version += 1
+        return previous
+    
+    def replace_all(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Синхронизирует каталог с полным списком записей:
+        меняются только добавленные, изменённые и удалённые записи
+        """
+        seen = set()
+        for record in records:
+            self.upsert(record)
+            seen.add(record.get("id"))
+        for record_id in [rid for rid in self._records if rid not in seen]:
+            self.remove(record_id)
+    
+    def _telegram_key(self, record: Dict[str, Any]) -> Optional[str]:
+        telegram_id = record.get("fields", {}).get("TelegramID")
+        return _normalize(telegram_id) if telegram_id is not None else None
+    
+    def _index(self, record: Dict[str, Any]) -> None:
+        telegram_id = self._telegram_key(record)
+        if telegram_id:
+            self._by_telegram_id[telegram_id] = record["id"]
+    
+    def _unindex(self, record: Dict[str, Any]) -> None:
+        telegram_id = self._telegram_key(record)
+        if telegram_id and self._by_telegram_id.get(telegram_id) == record["id"]:
+            del self._by_telegram_id[telegram_id]
+    
+
+# Глобальный экземпляр каталога
+_expert_catalog = None
+
+
+def get_expert_catalog() -> ExpertCatalog:
+    """Получает глобальный экземпляр каталога экспертов"""
+    global _expert_catalog
+    if _expert_catalog is None:
+        _expert_catalog = ExpertCatalog()
+    return _expert_catalog
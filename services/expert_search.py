@@ -0,0 +1,217 @@
+"""
+Инвертированный индекс и фасетный поиск по одобренным экспертам
+Индекс строится один раз на каждую версию списка экспертов, поэтому
+фильтрация /api/experts стоит O(совпадений), а не O(всех экспертов)
+"""
+import bisect
+import hashlib
+import json
+import re
+from collections import Counter, OrderedDict
+from typing import Optional, Dict, Any, List, Set
+
+# Фасеты: имя фасета -> ключ эксперта со значением (строка или список)
+FACET_KEYS = {
+    "language": "language",
+    "city": "city",
+    "direction": "directions",
+    "methods": "methods",
+    "formats": "formats",
+    "requests": "requests",
+}
+
+# Сколько наборов фильтров запоминать на индекс
+SEARCH_CACHE_SIZE = 256
+
+_TOKEN_SPLIT = re.compile(r"[\s,;/()\-]+")
+
+
+def _normalize(value: Any) -> str:
+    return str(value).strip().lower() if value is not None else ""
+
+
+def _values(value: Any) -> List[str]:
+    """Непустые строковые значения поля (одиночного или списка)"""
+    items = value if isinstance(value, list) else [value]
+    return [str(item).strip() for item in items if item is not None and str(item).strip()]
+
+
+def _tokens(text: str) -> List[str]:
+    return [token for token in _TOKEN_SPLIT.split(_normalize(text)) if token]
+
+
+class ExpertSearchIndex:
+    """Индекс по языку, токенам города и значениям Direction/Methods/Format/Requests"""
+    
+    def __init__(self, experts: List[Dict[str, Any]], version: int = 0):
+        self.experts = experts
+        self.version = version
+        # фасет -> нормализованный термин -> позиции экспертов в списке
+        self._postings: Dict[str, Dict[str, Set[int]]] = {
+            "language": {},
+            "city_tokens": {},
+            "direction": {},
+            "methods": {},
+            "formats": {},
+            "requests": {},
+        }
+        # Отображаемые значения фасетов по каждому эксперту (для подсчёта)
+        self._facet_values: List[Dict[str, List[str]]] = []
+        
+        for position, expert in enumerate(experts):
+            values = {facet: _values(expert.get(key)) for facet, key in FACET_KEYS.items()}
+            if not values["direction"]:
+                values["direction"] = _values(expert.get("direction"))
+            self._facet_values.append(values)
+            
+            self._add("language", _normalize(expert.get("language", "")), position)
+            for token in _tokens(expert.get("city") or ""):
+                self._add("city_tokens", token, position)
+            for facet in ("direction", "methods", "formats", "requests"):
+                for value in values[facet]:
+                    self._add(facet, _normalize(value), position)
+        
+        self.total_facets = self.facets(range(len(experts)))
+        self._fingerprint: Optional[str] = None
+        
+        # Стабильный порядок выдачи — по id записи (не зависит от порядка загрузки)
+        self._ids: List[str] = [str(expert.get("id") or "") for expert in experts]
+        self._rank: List[int] = [0] * len(experts)
+        for rank, position in enumerate(sorted(range(len(experts)), key=self._ids.__getitem__)):
+            self._rank[position] = rank
+        self._all_positions: List[int] = sorted(range(len(experts)), key=self._rank.__getitem__)
+        # Результаты поиска по наборам фильтров (страницы одного запроса не фильтруют заново)
+        self._results: "OrderedDict[tuple, List[int]]" = OrderedDict()
+    
+    @property
+    def fingerprint(self) -> str:
+        """
+        Хеш содержимого списка экспертов (считается один раз на индекс)
+        В отличие от version, одинаков во всех воркерах для одинаковых данных
+        """
+        if self._fingerprint is None:
+            payload = json.dumps(self.experts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+            self._fingerprint = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return self._fingerprint
+    
+    def _add(self, postings: str, term: str, position: int) -> None:
+        self._postings[postings].setdefault(term, set()).add(position)
+    
+    def _substring_match(self, postings: str, query: str) -> Set[int]:
+        """Объединение позиций всех терминов, содержащих query (обход словаря, не экспертов)"""
+        matched: Set[int] = set()
+        for term, positions in self._postings[postings].items():
+            if query in term:
+                matched |= positions
+        return matched
+    
+    def search(
+        self,
+        lang: Optional[str] = None,
+        city: Optional[str] = None,
+        direction: Optional[str] = None,
+        method: Optional[str] = None,
+        work_format: Optional[str] = None,
+        client_request: Optional[str] = None
+    ) -> List[int]:
+        """
+        Позиции подходящих экспертов в стабильном порядке (по id)
+        Результат кэшируется на индекс — список нельзя изменять
+        """
+        key = tuple(_normalize(value) for value in (lang, city, direction, method, work_format, client_request))
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            return result
+        
+        result = self._search(lang, city, direction, method, work_format, client_request)
+        self._results[key] = result
+        if len(self._results) > SEARCH_CACHE_SIZE:
+            self._results.popitem(last=False)
+        return result
+    
+    def _search(
+        self,
+        lang: Optional[str],
+        city: Optional[str],
+        direction: Optional[str],
+        method: Optional[str],
+        work_format: Optional[str],
+        client_request: Optional[str]
+    ) -> List[int]:
+        filters: List[Set[int]] = []
+        
+        if lang:
+            filters.append(self._postings["language"].get(_normalize(lang), set()))
+        if city:
+            # Каждый токен запроса должен встречаться в одном из токенов города
+            for token in _tokens(city):
+                filters.append(self._substring_match("city_tokens", token))
+        for postings, query in (
+            ("direction", direction),
+            ("methods", method),
+            ("formats", work_format),
+            ("requests", client_request),
+        ):
+            if query and _normalize(query):
+                filters.append(self._substring_match(postings, _normalize(query)))
+        
+        if not filters:
+            return self._all_positions
+        
+        filters.sort(key=len)
+        result = set(filters[0])
+        for positions in filters[1:]:
+            result &= positions
+            if not result:
+                break
+        return sorted(result, key=self._rank.__getitem__)
+    
+    def id_at(self, position: int) -> str:
+        """Ключ сортировки (id записи) эксперта"""
+        return self._ids[position]
+    
+    def page_after(self, matches: List[int], after_id: Optional[str], limit: int) -> List[int]:
+        """
+        Страница результатов после эксперта с id after_id (keyset-пагинация)
+        Бинарный поиск по отсортированным совпадениям: O(log n + limit)
+        """
+        start = 0
+        if after_id:
+            start = bisect.bisect_right(matches, after_id, key=self._ids.__getitem__)
+        return matches[start:start + limit]
+    
+    def facets(self, positions) -> Dict[str, Dict[str, int]]:
+        """Количество экспертов по каждому значению фасетов среди positions"""
+        counters = {facet: Counter() for facet in FACET_KEYS}
+        for position in positions:
+            for facet, values in self._facet_values[position].items():
+                counters[facet].update(set(values))
+        return {facet: dict(counter.most_common()) for facet, counter in counters.items()}
+
+
+# Индекс для последнего полученного списка экспертов
+_search_index: Optional[ExpertSearchIndex] = None
+# Версия содержимого, по которой построен _search_index
+_search_index_key: Optional[str] = None
+
+
+def get_search_index(experts: List[Dict[str, Any]], content_key: Optional[str] = None) -> ExpertSearchIndex:
+    """
+    Возвращает индекс для списка экспертов
+    content_key — версия содержимого (см. get_approved_experts_versioned): пока
+    она не меняется, индекс не перестраивается, даже если список — новый объект
+    (кэш в sqlite/redis десериализует его при каждом обращении).
+    Без content_key индекс сравнивается по объекту списка.
+    Индекс хранит свой список — выдачу нужно строить по index.experts
+    """
+    global _search_index, _search_index_key
+    if _search_index is not None:
+        if content_key is not None and content_key == _search_index_key:
+            return _search_index
+        if content_key is None and _search_index.experts is experts:
+            return _search_index
+    version = _search_index.version + 1 if _search_index is not None else 1
+    _search_index = ExpertSearchIndex(experts, version=version)
+    _search_index_key = content_key
+    return _search_index
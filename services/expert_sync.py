@@ -0,0 +1,366 @@
+"""
+Инкрементальная синхронизация таблицы Experts
+Вместо полной выгрузки каждые 30 минут запрашиваются только записи,
+изменённые после последней отметки (LAST_MODIFIED_TIME), а подписчики
+получают события: анкета создана / изменена / сменила статус / удалена
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Optional, Dict, Any, List, Callable, Awaitable
+
+from services.airtable_client import get_async_airtable_client, PRIORITY_BACKGROUND
+from services.expert_catalog import ExpertCatalog, get_expert_catalog
+from services.catalog_snapshot import CatalogSnapshot
+from services.shared_state import StateBackend, get_state_backend
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "Experts"
+SYNC_INTERVAL = 30  # секунды между запросами изменений
+FULL_SCAN_EVERY = 20  # каждый N-й цикл сверяем список id, чтобы найти удалённые записи
+WATERMARK_OVERLAP = 60  # секунды перекрытия окна (расхождение часов с Airtable)
+STATE_FILE = "logs/experts_sync.json"
+# Ключи общего состояния для синхронизации каталога несколькими воркерами
+LEADER_KEY = "catalog-sync:leader"
+PUBLISHED_VERSION_KEY = "catalog-sync:version"
+PUBLISHED_RECORDS_KEY = "catalog-sync:records"
+LEADER_LEASE_TTL = 3 * SYNC_INTERVAL  # лидер, переставший продлевать аренду, сменится
+PUBLISHED_TTL = 24 * 3600
+
+
+class ChangeType(Enum):
+    """Типы изменений записи"""
+    CREATED = "created"
+    UPDATED = "updated"
+    STATUS_CHANGED = "status_changed"
+    DELETED = "deleted"
+
+
+class ExpertChange:
+    """Событие изменения одной записи Experts"""
+    
+    def __init__(
+        self,
+        change_type: ChangeType,
+        record_id: str,
+        record: Optional[Dict[str, Any]] = None,
+        previous_status: Optional[str] = None,
+        previous_telegram_id: Optional[str] = None
+    ):
+        self.type = change_type
+        self.record_id = record_id
+        self.record = record  # None для удалённых записей
+        self.previous_status = previous_status
+        self.previous_telegram_id = previous_telegram_id
+    
+    @property
+    def fields(self) -> Dict[str, Any]:
+        return (self.record or {}).get("fields", {})
+    
+    @property
+    def telegram_id(self) -> Optional[str]:
+        telegram_id = self.fields.get("TelegramID")
+        if telegram_id is not None:
+            return str(telegram_id)
+        return self.previous_telegram_id
+    
+    def __repr__(self) -> str:
+        return f"ExpertChange({self.type.value}, {self.record_id})"
+
+
+ChangeListener = Callable[[List[ExpertChange]], Awaitable[None]]
+
+
+def _format_watermark(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _known_entry(record: Dict[str, Any]) -> Dict[str, Any]:
+    fields = record.get("fields", {})
+    telegram_id = fields.get("TelegramID")
+    return {
+        "telegram_id": str(telegram_id) if telegram_id is not None else None,
+        "status": fields.get("Status"),
+    }
+
+
+class ExpertsDeltaSync:
+    """
+    Движок дельта-синхронизации таблицы Experts
+    - первый цикл в процессе загружает таблицу целиком (заполняет каталог)
+    - далее запрашиваются только записи с LAST_MODIFIED_TIME() после отметки
+    - удалённые записи находятся периодической сверкой списка id
+    - отметка и известные статусы сохраняются в файл, поэтому после
+      перезапуска не возникает ложных событий
+    - при наличии снимка (CatalogSnapshot) каталог после перезапуска
+      заполняется с диска, а сверка с Airtable идёт уже в фоне
+    """
+    
+    def __init__(
+        self,
+        catalog: Optional[ExpertCatalog] = None,
+        state_file: Optional[str] = STATE_FILE,
+        interval: int = SYNC_INTERVAL,
+        table_name: str = TABLE_NAME,
+        snapshot: Optional[CatalogSnapshot] = None
+    ):
+        self.catalog = catalog or get_expert_catalog()
+        self.state_file = state_file
+        self.snapshot = snapshot
+        self._saved_version: Optional[int] = None
+        self.interval = interval
+        self.table_name = table_name
+        self.watermark: Optional[str] = None
+        # record_id -> {"telegram_id": ..., "status": ...}
+        self._known: Dict[str, Dict[str, Any]] = {}
+        self._listeners: List[ChangeListener] = []
+        self._cycle = 0
+        self._load_state()
+    
+    def subscribe(self, listener: ChangeListener) -> None:
+        """Подписывает корутину на пачки событий каждого цикла"""
+        self._listeners.append(listener)
+    
+    # ==========================
+    # 💾 Состояние
+    # ==========================
+    def _load_state(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.watermark = data.get("watermark")
+            self._known = data.get("known", {})
+            logger.info(f"Loaded sync state: watermark={self.watermark}, {len(self._known)} known records")
+        except Exception as e:
+            logger.warning(f"Could not load sync state from {self.state_file}: {e}")
+    
+    def _save_state(self) -> None:
+        if not self.state_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+            tmp_path = f"{self.state_file}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"watermark": self.watermark, "known": self._known}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_file)
+        except Exception as e:
+            logger.warning(f"Could not save sync state to {self.state_file}: {e}")
+    
+    def warm_start(self) -> bool:
+        """Заполняет каталог из снимка на диске; True, если снимок найден"""
+        if self.snapshot is None or self.catalog.ready:
+            return False
+        records, meta = self.snapshot.load()
+        if not records:
+            return False
+        
+        self.catalog.replace_all(records)
+        self.catalog.loaded_at = meta.get("saved_at") or time.time()
+        if not self._known:
+            self._known = {record["id"]: _known_entry(record) for record in records}
+        
+        # Снимок актуален на свою отметку — запрашиваем изменения от более ранней
+        snapshot_watermark = meta.get("watermark")
+        if snapshot_watermark and (self.watermark is None or snapshot_watermark < self.watermark):
+            self.watermark = snapshot_watermark
+        
+        # Первый цикл после тёплого старта сразу сверяет и удалённые записи
+        self._cycle = FULL_SCAN_EVERY - 1
+        self._saved_version = self.catalog.version
+        logger.info(f"Expert catalog warm-started from snapshot: {len(records)} records")
+        return True
+    
+    async def _save_snapshot(self) -> None:
+        if self.snapshot is None:
+            return
+        if self.catalog.version == self._saved_version:
+            # Содержимое не менялось — достаточно сдвинуть отметку
+            await asyncio.to_thread(self.snapshot.set_meta, "watermark", self.watermark)
+            return
+        records = self.catalog.all()
+        self._saved_version = self.catalog.version
+        await asyncio.to_thread(self.snapshot.save, records, self.watermark)
+    
+    # ==========================
+    # 🔄 Синхронизация
+    # ==========================
+    def _apply(self, record: Dict[str, Any]) -> Optional[ExpertChange]:
+        """Применяет запись к каталогу и известному состоянию, возвращает событие"""
+        record_id = record["id"]
+        fields = record.get("fields", {})
+        status = fields.get("Status")
+        
+        known = self._known.get(record_id)
+        previous = self.catalog.upsert(record)
+        self._known[record_id] = _known_entry(record)
+        
+        if known is None:
+            return ExpertChange(ChangeType.CREATED, record_id, record)
+        if known.get("status") != status:
+            return ExpertChange(
+                ChangeType.STATUS_CHANGED, record_id, record,
+                previous_status=known.get("status"),
+                previous_telegram_id=known.get("telegram_id")
+            )
+        if previous is not None and previous.get("fields") != fields:
+            return ExpertChange(ChangeType.UPDATED, record_id, record, previous_status=known.get("status"))
+        return None
+    
+    def _delete(self, record_id: str) -> ExpertChange:
+        known = self._known.pop(record_id, {})
+        self.catalog.remove(record_id)
+        return ExpertChange(
+            ChangeType.DELETED, record_id,
+            previous_status=known.get("status"),
+            previous_telegram_id=known.get("telegram_id")
+        )
+    
+    async def sync_once(self) -> List[ExpertChange]:
+        """Один цикл синхронизации, возвращает найденные изменения"""
+        client = get_async_airtable_client()
+        started_at = datetime.now(timezone.utc)
+        changes: List[ExpertChange] = []
+        
+        if not self.catalog.ready or not self.watermark:
+            # Полная загрузка: каталог пуст (старт процесса) или отметки ещё нет
+            records = await client.get_records(self.table_name, priority=PRIORITY_BACKGROUND)
+            seen = set()
+            for record in records:
+                seen.add(record["id"])
+                change = self._apply(record)
+                if change:
+                    changes.append(change)
+            for record_id in [rid for rid in self._known if rid not in seen]:
+                changes.append(self._delete(record_id))
+            self.catalog.replace_all(records)
+            self.catalog.loaded_at = time.time()
+        else:
+            formula = f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{self.watermark}'))"
+            async for record in client.iter_records(
+                self.table_name, formula=formula, priority=PRIORITY_BACKGROUND
+            ):
+                change = self._apply(record)
+                if change:
+                    changes.append(change)
+            
+            self._cycle += 1
+            if self._cycle % FULL_SCAN_EVERY == 0:
+                # Airtable не сообщает об удалениях — сверяем список id
+                existing = set()
+                async for record in client.iter_records(
+                    self.table_name, fields=["TelegramID"], priority=PRIORITY_BACKGROUND
+                ):
+                    existing.add(record["id"])
+                for record_id in [rid for rid in self._known if rid not in existing]:
+                    changes.append(self._delete(record_id))
+        
+        self.watermark = _format_watermark(started_at - timedelta(seconds=WATERMARK_OVERLAP))
+        self._save_state()
+        await self._save_snapshot()
+        
+        if changes:
+            logger.info(f"Experts sync: {len(changes)} changes (catalog version {self.catalog.version})")
+            for listener in self._listeners:
+                try:
+                    await listener(changes)
+                except Exception as e:
+                    logger.error(f"Error in experts sync listener: {e}", exc_info=True)
+        return changes
+    
+    async def run(self) -> None:
+        """Бесконечный цикл синхронизации (начинается с тёплого старта из снимка)"""
+        self.warm_start()
+        while True:
+            try:
+                await self.sync_once()
+            except Exception as e:
+                logger.error(f"Error syncing experts: {e}")
+            await asyncio.sleep(self.interval)
+
+
+class SharedCatalogSync:
+    """
+    Синхронизация каталога, общая для нескольких воркеров API
+    Airtable опрашивает только лидер — воркер, взявший аренду ключа в бэкенде
+    общего состояния (add с TTL, продлевается каждый цикл). Он же публикует
+    записи каталога в бэкенд, а остальные воркеры подхватывают их оттуда,
+    поэтому нагрузка на Airtable не растёт с числом воркеров.
+    Если лидер упал, аренда истекает и лидером становится другой воркер
+    """
+    
+    def __init__(
+        self,
+        sync: ExpertsDeltaSync,
+        backend: Optional[StateBackend] = None,
+        interval: int = SYNC_INTERVAL
+    ):
+        self.sync = sync
+        self.catalog = sync.catalog
+        self.backend = backend or get_state_backend()
+        self.interval = interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._published_version: Optional[int] = None
+        self._seen_version: Optional[str] = None
+    
+    async def _hold_lease(self) -> bool:
+        """Берёт или продлевает аренду лидера; True, если этот воркер — лидер"""
+        if await self.backend.get(LEADER_KEY) == self.worker_id:
+            await self.backend.set(LEADER_KEY, self.worker_id, ttl=LEADER_LEASE_TTL)
+            return True
+        return await self.backend.add(LEADER_KEY, self.worker_id, ttl=LEADER_LEASE_TTL)
+    
+    async def _publish(self) -> None:
+        """Публикует записи каталога, если они изменились с прошлой публикации"""
+        if not self.catalog.ready or self.catalog.version == self._published_version:
+            return
+        version = f"{self.worker_id}:{self.catalog.version}"
+        # Сначала записи, потом версия — последователь не увидит версию без данных
+        await self.backend.set(PUBLISHED_RECORDS_KEY, self.catalog.all(), ttl=PUBLISHED_TTL)
+        await self.backend.set(PUBLISHED_VERSION_KEY, version, ttl=PUBLISHED_TTL)
+        self._published_version = self.catalog.version
+        self._seen_version = version
+    
+    async def _follow(self) -> None:
+        """Подхватывает каталог, опубликованный лидером (только при смене версии)"""
+        version = await self.backend.get(PUBLISHED_VERSION_KEY)
+        if not version or version == self._seen_version:
+            return
+        records = await self.backend.get(PUBLISHED_RECORDS_KEY)
+        if records is None:
+            return
+        self.catalog.replace_all(records)
+        self.catalog.loaded_at = time.time()
+        self._seen_version = version
+        logger.info(f"Expert catalog loaded from leader: {len(records)} records (version {self.catalog.version})")
+    
+    async def run_once(self) -> None:
+        """Один цикл: лидер синхронизирует и публикует, остальные читают опубликованное"""
+        leader = await self._hold_lease()
+        if leader != self.is_leader:
+            self.is_leader = leader
+            logger.info(f"Catalog sync: worker {self.worker_id} is {'leader' if leader else 'follower'}")
+        if leader:
+            await self.sync.sync_once()
+            await self._publish()
+        else:
+            await self._follow()
+    
+    async def run(self) -> None:
+        """Бесконечный цикл (начинается с тёплого старта из снимка на диске)"""
+        self.sync.warm_start()
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Error in shared catalog sync: {e}")
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,181 @@
+"""
+Постоянное хранилище FSM для aiogram (SQLite в режиме WAL)
+- чтение состояния и данных — из кэша в памяти процесса (read-through:
+  при промахе строка читается из SQLite один раз, в отдельном потоке)
+- запись сразу меняет кэш, а на диск попадает пачкой раз в FLUSH_INTERVAL
+  секунд в отдельном потоке (write-behind), поэтому шаг анкеты не ждёт диск
+- после перезапуска незавершённые анкеты продолжаются с того же шага
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+logger = logging.getLogger(__name__)
+
+FSM_DB_PATH = "logs/fsm_storage.db"
+# Как часто (сек) сбрасывать изменения на диск
+FLUSH_INTERVAL = 0.2
+
+
+def _storage_key(key: StorageKey) -> str:
+    return ":".join(
+        str(getattr(key, name, None) or "")
+        for name in ("bot_id", "chat_id", "user_id", "thread_id", "destiny")
+    )
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище: кэш в памяти + SQLite с отложенной пакетной записью"""
+
+    def __init__(self, path: str = FSM_DB_PATH, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Чтение — в своём потоке, запись — в потоке сброса; WAL позволяет одновременно
+        self._read_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-read")
+        self._reader = self._connect(check_same_thread=False)
+        self._writer = self._connect(check_same_thread=False)
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS fsm "
+            "(key TEXT PRIMARY KEY, state TEXT, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._writer.commit()
+        # key -> [state, data]; пустая запись [None, {}] остаётся, пока удаление
+        # не записано на диск, иначе промах кэша прочитал бы из SQLite старую строку
+        self._cache: Dict[str, list] = {}
+        # key -> (state, data JSON) — ещё не записано на диск
+        self._dirty: Dict[str, Tuple[Optional[str], str]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        # Одна запись на диск за раз (в том числе при закрытии)
+        self._flush_lock = asyncio.Lock()
+        self._closed = False
+
+    def _connect(self, check_same_thread: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=check_same_thread)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ==========================
+    # 📖 Кэш
+    # ==========================
+    def _read_row(self, storage_key: str) -> Optional[Tuple[Optional[str], str]]:
+        # Выполняется только в потоке self._read_executor
+        return self._reader.execute(
+            "SELECT state, data FROM fsm WHERE key = ?", (storage_key,)
+        ).fetchone()
+
+    async def _entry(self, key: StorageKey) -> list:
+        storage_key = _storage_key(key)
+        entry = self._cache.get(storage_key)
+        if entry is None:
+            loop = asyncio.get_running_loop()
+            row = await loop.run_in_executor(
+                self._read_executor, functools.partial(self._read_row, storage_key)
+            )
+            # Пока шло чтение, запись могла появиться в кэше — она новее строки с диска
+            entry = self._cache.get(storage_key)
+            if entry is None:
+                entry = [row[0], json.loads(row[1])] if row else [None, {}]
+                self._cache[storage_key] = entry
+        return entry
+
+    def _mark_dirty(self, key: StorageKey, entry: list) -> None:
+        storage_key = _storage_key(key)
+        state, data = entry
+        self._dirty[storage_key] = (state, json.dumps(data, ensure_ascii=False, default=str))
+        self._ensure_flusher()
+
+    # ==========================
+    # 💾 Сброс на диск
+    # ==========================
+    def _ensure_flusher(self) -> None:
+        if self._closed:
+            return
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self) -> None:
+        while self._dirty and not self._closed:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения одной транзакцией"""
+        async with self._flush_lock:
+            if not self._dirty or self._closed:
+                return
+            batch, self._dirty = self._dirty, {}
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"Could not write FSM state: {e}")
+                # Вернём несохранённое, не затирая более новые изменения
+                for storage_key, value in batch.items():
+                    self._dirty.setdefault(storage_key, value)
+                return
+            # Удаление записано — пустые записи (анкета завершена) в памяти больше не держим
+            for storage_key in batch:
+                entry = self._cache.get(storage_key)
+                if storage_key not in self._dirty and entry is not None and entry[0] is None and not entry[1]:
+                    del self._cache[storage_key]
+
+    def _write_batch(self, batch: Dict[str, Tuple[Optional[str], str]]) -> None:
+        now = time.time()
+        with self._writer:
+            for storage_key, (state, data) in batch.items():
+                if state is None and data == "{}":
+                    self._writer.execute("DELETE FROM fsm WHERE key = ?", (storage_key,))
+                else:
+                    self._writer.execute(
+                        "INSERT OR REPLACE INTO fsm (key, state, data, updated_at) VALUES (?, ?, ?, ?)",
+                        (storage_key, state, data, now)
+                    )
+
+    # ==========================
+    # 🧩 BaseStorage
+    # ==========================
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        entry = await self._entry(key)
+        entry[0] = state.state if isinstance(state, State) else state
+        self._mark_dirty(key, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return (await self._entry(key))[0]
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        entry = await self._entry(key)
+        entry[1] = data.copy()
+        self._mark_dirty(key, entry)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return (await self._entry(key))[1].copy()
+
+    async def update_data(self, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        entry = await self._entry(key)
+        entry[1].update(data)
+        self._mark_dirty(key, entry)
+        return entry[1].copy()
+
+    async def close(self) -> None:
+        if self._closed:
+            return
+        # Дожидаемся текущей записи и сохраняем остаток
+        async with self._flush_lock:
+            self._closed = True
+            if self._dirty:
+                batch, self._dirty = self._dirty, {}
+                self._write_batch(batch)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._read_executor, self._reader.close)
+        self._read_executor.shutdown(wait=False)
+        self._writer.close()
@@ -0,0 +1,90 @@
+"""
+Отложенное обновление inline-клавиатур при мультивыборе
+Нажатия на одно сообщение в течение EDIT_DELAY секунд объединяются:
+в Telegram уходит только последняя клавиатура, а если выбор вернулся
+к исходному — не уходит ничего. Меньше исходящих запросов — меньше
+риск упереться в лимиты Telegram на редактирование.
+"""
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import InlineKeyboardMarkup, Message
+
+logger = logging.getLogger(__name__)
+
+# Окно (сек), в течение которого нажатия объединяются в одно редактирование
+EDIT_DELAY = 0.4
+
+
+class _PendingEdit:
+    __slots__ = ("message", "markup", "original", "task")
+
+    def __init__(self, message: Message, markup: InlineKeyboardMarkup):
+        self.message = message
+        self.markup = markup
+        # Клавиатура, которая сейчас видна пользователю
+        self.original = message.reply_markup
+        self.task: Optional[asyncio.Task] = None
+
+
+class KeyboardEditScheduler:
+    """Объединяет частые edit_reply_markup одного сообщения в одно"""
+
+    def __init__(self, delay: float = EDIT_DELAY):
+        self.delay = delay
+        # (chat_id, message_id) -> ожидающее редактирование
+        self._pending: Dict[Tuple[int, int], _PendingEdit] = {}
+
+    @staticmethod
+    def _key(message: Message) -> Tuple[int, int]:
+        return message.chat.id, message.message_id
+
+    def schedule(self, message: Message, markup: InlineKeyboardMarkup) -> None:
+        """Запоминает новую клавиатуру сообщения; в Telegram она уйдёт после паузы"""
+        key = self._key(message)
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.markup = markup
+            return
+        pending = _PendingEdit(message, markup)
+        pending.task = asyncio.create_task(self._apply(key, pending))
+        self._pending[key] = pending
+
+    def cancel(self, message: Message) -> None:
+        """Отменяет ожидающее редактирование (сообщение сейчас будет заменено)"""
+        pending = self._pending.pop(self._key(message), None)
+        if pending is not None and pending.task is not None:
+            pending.task.cancel()
+
+    async def _apply(self, key: Tuple[int, int], pending: _PendingEdit) -> None:
+        while True:
+            await asyncio.sleep(self.delay)
+            markup = pending.markup
+            if markup != pending.original:
+                try:
+                    await pending.message.edit_reply_markup(reply_markup=markup)
+                except TelegramBadRequest as e:
+                    # "message is not modified" и удалённые сообщения — не ошибка
+                    logger.debug(f"Keyboard edit skipped: {e}")
+                except Exception as e:
+                    logger.warning(f"Could not edit keyboard: {e}")
+                pending.original = markup
+            # Пока шёл запрос, могли прийти новые нажатия — отправим и их
+            if pending.markup == markup:
+                if self._pending.get(key) is pending:
+                    del self._pending[key]
+                return
+
+
+# Глобальный экземпляр планировщика
+_keyboard_edits = None
+
+
+def get_keyboard_edits() -> KeyboardEditScheduler:
+    """Получает глобальный планировщик редактирования клавиатур"""
+    global _keyboard_edits
+    if _keyboard_edits is None:
+        _keyboard_edits = KeyboardEditScheduler()
+    return _keyboard_edits
@@ -1,19 +1,44 @@
 """
 Настройка структурированного логирования
+Записи из event loop только кладутся в очередь (QueueHandler), а форматирование
+и запись в stdout/файл выполняет отдельный поток (QueueListener).
+Потоки сбрасываются пачками: каждые FLUSH_EVERY записей, раз в FLUSH_INTERVAL
+секунд или сразу для WARNING и выше.
 """
+import atexit
 import logging
 import json
+import queue
 import sys
-from datetime import datetime
-from typing import Any, Dict
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Сброс буферов потоков вывода: по числу записей и по времени
+FLUSH_EVERY = 100
+FLUSH_INTERVAL = 1.0
 
 
 class JSONFormatter(logging.Formatter):
     """Форматтер для структурированного JSON логирования"""
-    
+
+    def __init__(self):
+        super().__init__()
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+        # Строка времени с точностью до секунды пересчитывается раз в секунду
+        self._cached_second = None
+        self._cached_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        second = int(created)
+        if second != self._cached_second:
+            self._cached_second = second
+            self._cached_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        return f"{self._cached_prefix}.{int((created - second) * 1000):03d}Z"
+
     def format(self, record: logging.LogRecord) -> str:
         log_data: Dict[str, Any] = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "timestamp": self._timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -21,28 +46,118 @@ class JSONFormatter(logging.Formatter):
             "function": record.funcName,
             "line": record.lineno,
         }
-        
+
         # Добавляем исключение, если есть
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
-        
+
         # Добавляем дополнительные поля из extra
         if hasattr(record, "extra"):
             log_data.update(record.extra)
-        
-        return json.dumps(log_data, ensure_ascii=False)
+
+        return self._encoder.encode(log_data)
+
+
+class LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler для очереди внутри процесса
+    Не форматирует запись в вызывающем потоке — только фиксирует текст сообщения
+    (аргументы могут измениться позже); остальное делает поток записи
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class BatchedFlushMixin:
+    """Сбрасывает поток не после каждой записи, а пачками"""
+
+    def _init_batching(self) -> None:
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self) -> None:
+        # Вызывается из emit() — откладываем, пока пачка не наберётся
+        if self._unflushed < FLUSH_EVERY and time.monotonic() - self._last_flush < FLUSH_INTERVAL:
+            return
+        self.force_flush()
+
+    def force_flush(self) -> None:
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        super().flush()
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self._unflushed += 1
+        super().emit(record)
+        if record.levelno >= logging.WARNING:
+            self.force_flush()
+
+
+class BatchedStreamHandler(BatchedFlushMixin, logging.StreamHandler):
+    def __init__(self, stream=None):
+        super().__init__(stream)
+        self._init_batching()
+
+
+class BatchedFileHandler(BatchedFlushMixin, logging.FileHandler):
+    def __init__(self, filename: str, encoding: Optional[str] = None):
+        super().__init__(filename, encoding=encoding)
+        self._init_batching()
+
+    def close(self) -> None:
+        if self.stream:
+            self.force_flush()
+        super().close()
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener, который сбрасывает буферы, когда очередь простаивает"""
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        while True:
+            try:
+                return self.queue.get(block, timeout=FLUSH_INTERVAL)
+            except queue.Empty:
+                self.flush()
+                if not block:
+                    raise
+
+    def flush(self) -> None:
+        for handler in self.handlers:
+            force_flush = getattr(handler, "force_flush", handler.flush)
+            force_flush()
+
+
+# Текущий поток записи логов (один на процесс)
+_listener: Optional[BatchingQueueListener] = None
+
+
+def stop_logging() -> None:
+    """Дописывает очередь и останавливает поток записи логов"""
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
 
 
 def setup_logging(level: str = "INFO", json_format: bool = False):
     """
     Настраивает логирование для приложения
-    
+
     Args:
         level: Уровень логирования (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         json_format: Использовать JSON формат (для продакшена) или обычный
     """
+    global _listener
     log_level = getattr(logging, level.upper(), logging.INFO)
-    
+
     # Создаем форматтер
     if json_format:
         formatter = JSONFormatter()
@@ -51,31 +166,40 @@ def setup_logging(level: str = "INFO", json_format: bool = False):
             "%(asctime)s | [%(levelname)s] | %(name)s | %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S"
         )
-    
+
     # Настраиваем root logger
     root_logger = logging.getLogger()
     root_logger.setLevel(log_level)
-    
+
     # Удаляем существующие обработчики
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
-    
+    stop_logging()
+
     # Консольный обработчик
-    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler = BatchedStreamHandler(sys.stdout)
     console_handler.setLevel(log_level)
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
-    
+    handlers = [console_handler]
+
     # Файловый обработчик (опционально)
     try:
         import os
         os.makedirs("logs", exist_ok=True)
-        file_handler = logging.FileHandler("logs/app.log", encoding="utf-8")
+        file_handler = BatchedFileHandler("logs/app.log", encoding="utf-8")
         file_handler.setLevel(log_level)
         file_handler.setFormatter(formatter)
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
     except Exception as e:
         print(f"Warning: Could not setup file logging: {e}")
-    
+
+    # Event loop только кладёт записи в очередь, пишет отдельный поток
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root_logger.addHandler(LocalQueueHandler(log_queue))
+    _listener = BatchingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
     return root_logger
 
+
+atexit.register(stop_logging)
@@ -0,0 +1,250 @@
+"""
+Кэш фотографий экспертов на диске
+- фото скачивается один раз, уменьшается до фиксированного размера
+  (Pillow из requirements.txt; без него — готовая миниатюра Airtable)
+- файлы адресуются хешем содержимого, одинаковые фото хранятся один раз
+- общий размер ограничен, при превышении удаляются давно не запрошенные (LRU)
+- учёт файлов у каждого воркера свой, поэтому файл, удалённый другим
+  воркером, считается промахом и скачивается заново
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from services.singleflight import SingleFlight
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+PHOTO_CACHE_DIR = "logs/photo_cache"
+PHOTO_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# Размеры: имя -> длинная сторона в пикселях (None — оригинал)
+PHOTO_SIZES = {"card": 400, "full": None}
+DEFAULT_PHOTO_SIZE = "card"
+THUMBNAIL_QUALITY = 82
+DOWNLOAD_TIMEOUT = 15  # секунды
+MAX_DOWNLOAD_BYTES = 20 * 1024 * 1024
+# Не чаще, чем раз в столько секунд обновляем mtime файла при попадании
+TOUCH_INTERVAL = 60
+
+
+def photo_attachment(record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Первое вложение из поля Photo записи Airtable"""
+    photos = record.get("fields", {}).get("Photo")
+    if isinstance(photos, list) and photos and isinstance(photos[0], dict) and photos[0].get("url"):
+        return photos[0]
+    return None
+
+
+class PhotoCache:
+    """Содержимо-адресуемое хранилище миниатюр с LRU-вытеснением"""
+
+    def __init__(self, directory: str = PHOTO_CACHE_DIR, max_bytes: int = PHOTO_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(directory, "index.json")
+        # ключ (вложение:размер) -> {"digest", "content_type"}
+        self._index: Dict[str, Dict[str, str]] = {}
+        # digest -> (путь, размер); порядок — от давно не запрошенных к свежим
+        self._blobs: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._total = 0
+        self._loaded = False
+        self._fetches = SingleFlight()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    # ==========================
+    # 💾 Диск
+    # ==========================
+    def _blob_path(self, digest: str, content_type: str) -> str:
+        ext = ".webp" if content_type == "image/webp" else ".png" if content_type == "image/png" else ".jpg"
+        return os.path.join(self.directory, "blobs", digest[:2], digest + ext)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+        except FileNotFoundError:
+            self._index = {}
+        except Exception as e:
+            logger.warning(f"Could not read photo cache index: {e}")
+            self._index = {}
+
+        blobs = []
+        for root, _, files in os.walk(os.path.join(self.directory, "blobs")):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        for _, digest, path, size in sorted(blobs):
+            self._blobs[digest] = (path, size)
+            self._total += size
+        # Ключи, чьи файлы пропали, забываем
+        self._index = {key: entry for key, entry in self._index.items() if entry["digest"] in self._blobs}
+
+    def _touch(self, digest: str) -> None:
+        self._blobs.move_to_end(digest)
+        now = time.time()
+        if now - self._touched.get(digest, 0) >= TOUCH_INTERVAL:
+            self._touched[digest] = now
+            try:
+                os.utime(self._blobs[digest][0])
+            except OSError:
+                pass
+
+    def _evict(self) -> list:
+        """Вытесняет давно не запрошенные файлы из учёта; возвращает пути для удаления"""
+        evicted = {}
+        while self._total > self.max_bytes and len(self._blobs) > 1:
+            digest, (path, size) = self._blobs.popitem(last=False)
+            self._total -= size
+            self._touched.pop(digest, None)
+            evicted[digest] = path
+        if evicted:
+            self._index = {key: entry for key, entry in self._index.items() if entry["digest"] not in evicted}
+            logger.info(f"Photo cache evicted {len(evicted)} files")
+        return list(evicted.values())
+
+    @staticmethod
+    def _write_blob(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _persist(self, removed: list, index: Dict[str, Dict[str, str]]) -> None:
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path)
+
+    async def _store(self, key: str, data: bytes, content_type: str) -> Tuple[str, str, str]:
+        """Сохраняет фото: запись на диск — в потоке, учёт — в event loop"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest, content_type)
+        if digest not in self._blobs:
+            await asyncio.to_thread(self._write_blob, path, data)
+            self._blobs[digest] = (path, len(data))
+            self._total += len(data)
+        self._index[key] = {"digest": digest, "content_type": content_type}
+        self._touch(digest)
+        removed = self._evict()
+        try:
+            await asyncio.to_thread(self._persist, removed, dict(self._index))
+        except OSError as e:
+            logger.warning(f"Could not save photo cache index: {e}")
+        return path, digest, content_type
+
+    def lookup(self, key: str) -> Optional[Tuple[str, str, str]]:
+        """(путь, digest, content-type) закэшированного фото или None"""
+        self._load()
+        entry = self._index.get(key)
+        if entry is None or entry["digest"] not in self._blobs:
+            return None
+        digest = entry["digest"]
+        path = self._blobs[digest][0]
+        if not os.path.exists(path):
+            # Каталог общий для воркеров: файл мог вытеснить другой процесс
+            self._forget(digest)
+            return None
+        self._touch(digest)
+        return path, digest, entry["content_type"]
+
+    def _forget(self, digest: str) -> None:
+        """Убирает из учёта файл, удалённый с диска не этим процессом"""
+        _, size = self._blobs.pop(digest)
+        self._total -= size
+        self._touched.pop(digest, None)
+        self._index = {key: entry for key, entry in self._index.items() if entry["digest"] != digest}
+
+    # ==========================
+    # 🌐 Загрузка и миниатюры
+    # ==========================
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Отдельная сессия без заголовков Airtable — токен не уходит на CDN
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT))
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _download(self, url: str) -> Tuple[bytes, str]:
+        async with self._get_session().get(url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type", "image/jpeg").split(";")[0].strip()
+            data = await response.content.read(MAX_DOWNLOAD_BYTES + 1)
+            if len(data) > MAX_DOWNLOAD_BYTES:
+                raise ValueError("Photo is too large")
+            return data, content_type
+
+    @staticmethod
+    def _thumbnail(data: bytes, max_side: int) -> Tuple[bytes, str]:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert("RGB")
+            image.thumbnail((max_side, max_side))
+            out = io.BytesIO()
+            image.save(out, format="JPEG", quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        return out.getvalue(), "image/jpeg"
+
+    async def _fetch(self, key: str, attachment: Dict[str, Any], size: str) -> Tuple[str, str, str]:
+        max_side = PHOTO_SIZES[size]
+        url = attachment["url"]
+        if max_side is not None and Image is None:
+            # Без Pillow берём готовую миниатюру Airtable (до 512px)
+            url = attachment.get("thumbnails", {}).get("large", {}).get("url") or url
+
+        data, content_type = await self._download(url)
+        if max_side is not None and Image is not None:
+            data, content_type = await asyncio.to_thread(self._thumbnail, data, max_side)
+        return await self._store(key, data, content_type)
+
+    async def get(self, attachment: Dict[str, Any], size: str = DEFAULT_PHOTO_SIZE) -> Tuple[str, str, str]:
+        """
+        Фото вложения нужного размера: (путь к файлу, digest, content-type)
+        Одновременные запросы одного фото скачивают его один раз
+        """
+        key = f"{attachment.get('id') or attachment['url']}:{size}"
+        cached = self.lookup(key)
+        if cached is not None:
+            return cached
+        return await self._fetches.do(key, lambda: self._fetch(key, attachment, size))
+
+
+# Глобальный экземпляр кэша фото
+_photo_cache = None
+
+
+def get_photo_cache() -> PhotoCache:
+    """Получает глобальный экземпляр кэша фото"""
+    global _photo_cache
+    if _photo_cache is None:
+        _photo_cache = PhotoCache()
+    return _photo_cache
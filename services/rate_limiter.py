@@ -0,0 +1,106 @@
+"""
+Rate limiter со скользящим окном (sliding window counter)
+На каждый ключ хранится только два счётчика — текущего и предыдущего окна,
+поэтому проверка стоит O(1) по времени и памяти независимо от трафика.
+Счётчики живут в бэкенде общего состояния (services.shared_state) и
+истекают сами, поэтому неактивные ключи не накапливаются.
+"""
+import math
+import time
+from typing import List, Optional, Tuple
+
+from services.shared_state import StateBackend, get_state_backend
+
+# Лимит по умолчанию: запросов за окно (сек)
+DEFAULT_LIMIT = 100
+DEFAULT_WINDOW = 60
+
+
+class RouteLimit:
+    """Лимит для группы маршрутов с общим префиксом пути"""
+
+    def __init__(self, name: str, prefix: str, limit: int, window: int):
+        self.name = name
+        self.prefix = prefix
+        self.limit = limit
+        self.window = window
+
+
+class SlidingWindowLimiter:
+    """
+    Скользящее окно по двум счётчикам
+
+    Оценка числа запросов за последние window секунд:
+    prev_count * (доля предыдущего окна, попадающая в скользящее) + curr_count
+    Счётчики хранятся в бэкенде общего состояния, поэтому лимит общий
+    для всех воркеров; неактивные ключи истекают через два окна.
+    """
+
+    def __init__(self, backend: Optional[StateBackend] = None):
+        self.backend = backend or get_state_backend()
+
+    async def hit(self, key: str, limit: int, window: int) -> Tuple[bool, int]:
+        """
+        Учитывает запрос по ключу
+
+        Returns:
+            (разрешён ли запрос, через сколько секунд повторить, если нет)
+        """
+        now = time.time()
+        window_start = int(now // window) * window
+        curr_key = f"rl:{key}:{window_start}"
+        # Сначала атомарно учитываем запрос — так воркеры не превысят лимит вместе
+        curr_count = await self.backend.incr(curr_key, 1, ttl=2 * window) - 1
+        prev_count = await self.backend.get(f"rl:{key}:{window_start - window}") or 0
+
+        elapsed = now - window_start
+        estimated = prev_count * (1 - elapsed / window) + curr_count
+        if estimated >= limit:
+            # Отклонённый запрос не расходует лимит
+            await self.backend.incr(curr_key, -1, ttl=2 * window)
+            return False, self._retry_after(prev_count, curr_count, limit, window, elapsed)
+
+        return True, 0
+
+    @staticmethod
+    def _retry_after(prev_count: int, curr_count: int, limit: int, window: int, elapsed: float) -> int:
+        if curr_count >= limit or prev_count == 0:
+            # Освободится только после смены окна
+            return max(1, math.ceil(window - elapsed))
+        # Момент, когда вклад предыдущего окна станет достаточно мал
+        free_at = window * (1 - (limit - curr_count) / prev_count)
+        return max(1, math.ceil(free_at - elapsed))
+
+
+class RateLimiter:
+    """Лимиты по маршрутам поверх скользящего окна"""
+
+    def __init__(
+        self,
+        routes: Optional[List[RouteLimit]] = None,
+        default_limit: int = DEFAULT_LIMIT,
+        default_window: int = DEFAULT_WINDOW,
+        backend: Optional[StateBackend] = None
+    ):
+        # Длинные префиксы проверяются первыми
+        self.routes = sorted(routes or [], key=lambda route: len(route.prefix), reverse=True)
+        self.default = RouteLimit("default", "", default_limit, default_window)
+        self.engine = SlidingWindowLimiter(backend)
+
+    def route_for(self, path: str) -> RouteLimit:
+        """Правило для пути запроса"""
+        for route in self.routes:
+            if path.startswith(route.prefix):
+                return route
+        return self.default
+
+    async def check(self, client_id: str, path: str) -> Tuple[bool, int, RouteLimit]:
+        """
+        Проверяет запрос клиента к пути
+
+        Returns:
+            (разрешён ли запрос, Retry-After в секундах, применённое правило)
+        """
+        route = self.route_for(path)
+        allowed, retry_after = await self.engine.hit(f"{route.name}:{client_id}", route.limit, route.window)
+        return allowed, retry_after, route
@@ -0,0 +1,325 @@
+"""
+Общее состояние для нескольких воркеров API
+Rate limiter и кэш хранят данные через бэкенд с единым интерфейсом:
+- memory — в памяти процесса (по умолчанию, один воркер)
+- sqlite — файл SQLite в режиме WAL, общий для воркеров на одном хосте
+- redis — Redis-совместимый сервер (для нескольких хостов)
+Интерфейс асинхронный: запросы к SQLite и Redis выполняются в отдельном
+потоке, поэтому ожидание блокировки файла или сети не останавливает event loop
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from config import STATE_BACKEND, STATE_DB_PATH, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+# Как часто (сек) удалять истёкшие ключи в memory/sqlite бэкендах
+PURGE_INTERVAL = 60
+
+
+class StateBackend:
+    """Интерфейс асинхронного хранилища ключ-значение с TTL"""
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Значение по ключу или None, если ключа нет или он истёк"""
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        """Сохраняет значение на ttl секунд"""
+        raise NotImplementedError
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        """Сохраняет значение, только если ключа нет; True, если сохранено"""
+        raise NotImplementedError
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        """Атомарно увеличивает счётчик и возвращает новое значение"""
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        """Удаляет ключ"""
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str) -> None:
+        """Удаляет все ключи с префиксом"""
+        raise NotImplementedError
+
+    async def count(self, prefix: str) -> int:
+        """Количество действующих ключей с префиксом"""
+        raise NotImplementedError
+
+    async def purge_expired(self) -> int:
+        """Удаляет истёкшие ключи; возвращает их количество"""
+        return 0
+
+
+class MemoryStateBackend(StateBackend):
+    """Хранилище в памяти процесса; истёкшие ключи удаляются периодически"""
+
+    def __init__(self, purge_interval: int = PURGE_INTERVAL):
+        # key -> (значение, момент истечения)
+        self._data: Dict[str, Tuple[Any, float]] = {}
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+
+    def _maybe_purge(self, now: float) -> None:
+        if now >= self._next_purge:
+            self._purge(now)
+
+    def _purge(self, now: float) -> int:
+        expired = [key for key, entry in self._data.items() if entry[1] <= now]
+        for key in expired:
+            del self._data[key]
+        self._next_purge = now + self.purge_interval
+        return len(expired)
+
+    def _get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if time.time() >= entry[1]:
+            del self._data[key]
+            return None
+        return entry[0]
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        self._maybe_purge(now)
+        self._data[key] = (value, now + ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._get(key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._set(key, value, ttl)
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        if self._get(key) is not None:
+            return False
+        self._set(key, value, ttl)
+        return True
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        value = (self._get(key) or 0) + amount
+        self._set(key, value, ttl)
+        return value
+
+    async def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._data if key.startswith(prefix)]:
+            del self._data[key]
+
+    async def count(self, prefix: str) -> int:
+        now = time.time()
+        return sum(1 for key, entry in self._data.items() if key.startswith(prefix) and entry[1] > now)
+
+    async def purge_expired(self) -> int:
+        return self._purge(time.time())
+
+
+class SQLiteStateBackend(StateBackend):
+    """
+    Хранилище в файле SQLite (WAL) — общее для всех воркеров на хосте
+    Значения сериализуются в JSON; счётчики обновляются одним UPSERT.
+    Запросы выполняются по очереди в выделенном потоке: пока другой воркер
+    держит блокировку файла (busy timeout), event loop продолжает работу
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH, purge_interval: int = PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._next_purge = time.time() + purge_interval
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Автокоммит: каждая операция — отдельная короткая транзакция
+        self._conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    async def _run(self, func, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    # Синхронные операции — выполняются только в потоке self._executor
+    def _maybe_purge(self, now: float) -> None:
+        if now >= self._next_purge:
+            self._purge(now)
+
+    def _purge(self, now: float) -> int:
+        self._next_purge = now + self.purge_interval
+        return self._conn.execute("DELETE FROM state WHERE expires_at <= ?", (now,)).rowcount
+
+    def _get(self, key: str) -> Optional[Any]:
+        row = self._conn.execute(
+            "SELECT value FROM state WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        now = time.time()
+        self._maybe_purge(now)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value, ensure_ascii=False, separators=(",", ":")), now + ttl)
+        )
+
+    def _add(self, key: str, value: Any, ttl: float) -> bool:
+        now = time.time()
+        # Истёкший ключ заменяется, действующий — остаётся
+        cursor = self._conn.execute(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE state.expires_at <= ?",
+            (key, json.dumps(value, ensure_ascii=False), now + ttl, now)
+        )
+        return cursor.rowcount > 0
+
+    def _incr(self, key: str, amount: int, ttl: float) -> int:
+        now = time.time()
+        self._maybe_purge(now)
+        row = self._conn.execute(
+            "INSERT INTO state (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            "value = CASE WHEN state.expires_at <= ? THEN excluded.value "
+            "ELSE CAST(state.value AS INTEGER) + excluded.value END, "
+            "expires_at = excluded.expires_at "
+            "RETURNING value",
+            (key, amount, now + ttl, now)
+        ).fetchone()
+        return int(row[0])
+
+    def _delete(self, key: str) -> None:
+        self._conn.execute("DELETE FROM state WHERE key = ?", (key,))
+
+    def _delete_prefix(self, prefix: str) -> None:
+        self._conn.execute("DELETE FROM state WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def _count(self, prefix: str) -> int:
+        row = self._conn.execute(
+            "SELECT COUNT(*) FROM state WHERE substr(key, 1, ?) = ? AND expires_at > ?",
+            (len(prefix), prefix, time.time())
+        ).fetchone()
+        return row[0]
+
+    async def get(self, key: str) -> Optional[Any]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._run(self._set, key, value, ttl)
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        return await self._run(self._add, key, value, ttl)
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        return await self._run(self._incr, key, amount, ttl)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self._delete, key)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        await self._run(self._delete_prefix, prefix)
+
+    async def count(self, prefix: str) -> int:
+        return await self._run(self._count, prefix)
+
+    async def purge_expired(self) -> int:
+        return await self._run(self._purge, time.time())
+
+
+class RedisStateBackend(StateBackend):
+    """
+    Хранилище в Redis-совместимом сервере
+    Принимает готовый клиент с API redis-py (в т.ч. локальную замену для проверки);
+    синхронные вызовы клиента выполняются в потоке
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _ttl_ms(ttl: float) -> int:
+        return max(1, int(ttl * 1000))
+
+    def _incr(self, key: str, amount: int, ttl: float) -> int:
+        pipe = self.client.pipeline()
+        pipe.incrby(key, amount)
+        pipe.pexpire(key, self._ttl_ms(ttl))
+        value, _ = pipe.execute()
+        return int(value)
+
+    def _delete_prefix(self, prefix: str) -> None:
+        keys = list(self.client.scan_iter(match=f"{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def _count(self, prefix: str) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=f"{prefix}*"))
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await asyncio.to_thread(self.client.get, key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(
+            self.client.set, key, json.dumps(value, ensure_ascii=False), px=self._ttl_ms(ttl)
+        )
+
+    async def add(self, key: str, value: Any, ttl: float) -> bool:
+        return bool(await asyncio.to_thread(
+            self.client.set, key, json.dumps(value, ensure_ascii=False), px=self._ttl_ms(ttl), nx=True
+        ))
+
+    async def incr(self, key: str, amount: int, ttl: float) -> int:
+        return await asyncio.to_thread(self._incr, key, amount, ttl)
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread(self.client.delete, key)
+
+    async def delete_prefix(self, prefix: str) -> None:
+        await asyncio.to_thread(self._delete_prefix, prefix)
+
+    async def count(self, prefix: str) -> int:
+        return await asyncio.to_thread(self._count, prefix)
+
+
+def create_state_backend(kind: str = STATE_BACKEND) -> StateBackend:
+    """Создаёт бэкенд по имени из конфигурации (memory / sqlite / redis)"""
+    kind = (kind or "memory").lower()
+    if kind == "sqlite":
+        return SQLiteStateBackend()
+    if kind == "redis":
+        try:
+            import redis
+        except ImportError:
+            logger.warning("STATE_BACKEND=redis, but the redis package is not installed — using memory")
+            return MemoryStateBackend()
+        return RedisStateBackend(redis.Redis.from_url(REDIS_URL))
+    if kind != "memory":
+        logger.warning(f"Unknown STATE_BACKEND '{kind}' — using memory")
+    return MemoryStateBackend()
+
+
+# Глобальный экземпляр бэкенда
+_state_backend = None
+
+
+def get_state_backend() -> StateBackend:
+    """Получает глобальный экземпляр бэкенда общего состояния"""
+    global _state_backend
+    if _state_backend is None:
+        _state_backend = create_state_backend()
+    return _state_backend
@@ -0,0 +1,40 @@
+"""
+Single-flight: объединение одинаковых одновременных запросов
+Пока запрос с ключом выполняется, повторные вызовы с тем же ключом
+не создают новый запрос, а ждут результат уже запущенного
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Группа одновременных вызовов, объединяемых по ключу"""
+    
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+    
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет func() один раз на ключ среди одновременных вызовов
+        
+        Все ожидающие получают один и тот же объект результата (или исключение),
+        поэтому результат нельзя изменять на месте.
+        Отмена одного ожидающего не отменяет общий запрос.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+    
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Помечаем исключение как полученное, даже если все ожидающие отменены
+        if not task.cancelled():
+            task.exception()
+    
+    def in_flight(self) -> int:
+        """Количество выполняющихся запросов"""
+        return len(self._calls)
@@ -1,10 +1,12 @@
-import asyncio
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
+from typing import List
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from pyairtable import Table
-from config import AIRTABLE_API_KEY, AIRTABLE_BASE_ID
+from services.airtable_client import PRIORITY_BACKGROUND
+from services.airtable_batch import AirtableWriteBuffer
+from services.expert_sync import ExpertsDeltaSync, ExpertChange, ChangeType
+from services.catalog_snapshot import get_catalog_snapshot
 from keyboards.main_menu import get_main_menu, get_post_approval_menu  
 
 # ==============================
@@ -23,15 +25,24 @@ logging.basicConfig(
 )
 
 # --- Таблица Airtable ---
-table = Table(AIRTABLE_API_KEY, AIRTABLE_BASE_ID, "Experts")
+TABLE_NAME = "Experts"
+
+# --- Отметки Notified копятся и уходят пачками по 10 записей ---
+notified_writes = AirtableWriteBuffer(TABLE_NAME, priority=PRIORITY_BACKGROUND)
+
+
+async def close_notified_writes() -> None:
+    """Записывает оставшиеся отметки Notified при остановке бота"""
+    try:
+        await notified_writes.close()
+    except RuntimeError as e:
+        # Несохранённые отметки — повторное уведомление после перезапуска
+        logging.error(f"⚠️ Не удалось сохранить отметки Notified: {e}")
+
 
 # --- Канал для уведомлений ---
 CHANNEL_ID = -1003351503095  # PAZL Collab — Moderation
 
-# --- Кэш статусов и время последней очистки ---
-known_statuses = {}
-last_cache_reset = datetime.now()
-
 # --- Отображение статусов ---
 STATUS_DISPLAY = {
     "approved": {"ru": "🟢 Одобрено", "en": "🟢 Approved"},
@@ -79,167 +90,170 @@ async def notify_new_expert(bot, expert_name: str, lang: str, record_id: str = N
 
 
 # ==============================
-# 🔄 Проверка статусов экспертов
+# 🧹 Нормализация статуса
 # ==============================
-async def check_expert_status(bot):
-    """Проверяет статусы анкет и уведомляет пользователей при изменении"""
-    global last_cache_reset
+def normalize_status(raw_status) -> str:
+    """Приводит статус (RU/EN, с эмодзи) к approved / pending / declined / unknown"""
+    cleaned_status = (
+        str(raw_status or "").strip().lower()
+        .replace("🟢", "")
+        .replace("🟡", "")
+        .replace("🔴", "")
+        .replace(":", "")
+        .replace(" ", "")
+        .strip()
+    )
 
-    logging.info("🔍 Фоновый мониторинг статусов экспертов запущен...")
+    if cleaned_status in ["approved", "одобрено"]:
+        return "approved"
+    if cleaned_status in ["pending", "намодерации"]:
+        return "pending"
+    if cleaned_status in ["declined", "отклонено"]:
+        return "declined"
+    return "unknown"
+
+
+async def _detect_lang(bot, fields: dict, telegram_id: str) -> str:
+    """Язык анкеты, а если он не указан — язык пользователя в Telegram"""
+    lang = fields.get("Language")
+    if lang and isinstance(lang, str) and lang.strip() != "":
+        return lang
+    try:
+        user = await bot.get_chat(int(telegram_id))
+        lang_code = getattr(user, "language_code", "en").lower()
+        return "ru" if lang_code.startswith(("ru", "uk", "be")) else "en"
+    except Exception:
+        return "en"
 
-    while True:
-        try:
-            # Очистка кэша каждые 24 часа
-            if datetime.now() - last_cache_reset >= timedelta(hours=24):
-                known_statuses.clear()
-                last_cache_reset = datetime.now()
-                logging.info("♻️ Кэш статусов сброшен (24 часа прошло).")
-
-            # Получаем все записи
-            records = table.all(fields=["TelegramID", "Status", "Language", "Notified"])
-            total = len(records)
-            approved_count = 0
-
-            # --- Проверка существующих ID ---
-            # TelegramID в Airtable - Number, преобразуем в строку для сравнения
-            existing_ids = {
-                str(rec.get("fields", {}).get("TelegramID"))
-                for rec in records
-                if rec.get("fields", {}).get("TelegramID") is not None
-            }
-
-            # --- Удалённые анкеты ---
-            for telegram_id in list(known_statuses.keys()):
-                if telegram_id not in existing_ids:
-                    try:
-                        await bot.send_message(
-                            chat_id=int(telegram_id),
-                            text="♻️ Обновляем интерфейс...",
-                            reply_markup=None
-                        )
-                        await bot.send_message(
-                            chat_id=int(telegram_id),
-                            text=(
-                                "📋 Ваша анкета больше не найдена в базе.\n"
-                                "Пожалуйста, заполните новую, чтобы участвовать в проектах PAZL Collab 🙌"
-                            ),
-                            reply_markup=get_main_menu("ru")
-                        )
-                        logging.info(f"🗑 Анкета {telegram_id} удалена — показано стартовое меню.")
-                    except Exception as e:
-                        logging.error(f"⚠️ Ошибка при уведомлении об удалённой анкете ({telegram_id}): {e}")
-                    finally:
-                        known_statuses.pop(telegram_id, None)
-
-            # --- Проверка и уведомления ---
-            for rec in records:
-                fields = rec.get("fields", {})
-                record_id = rec.get("id")
-                # TelegramID в Airtable - Number, преобразуем в строку
-                telegram_id_raw = fields.get("TelegramID")
-                if telegram_id_raw is None:
-                    continue
-                telegram_id = str(telegram_id_raw)
-                raw_status = str(fields.get("Status", "")).strip().lower()
-
-                # --- Определяем язык анкеты ---
-                lang = fields.get("Language")
-                if not lang or not isinstance(lang, str) or lang.strip() == "":
-                    try:
-                        user = await bot.get_chat(int(telegram_id))
-                        lang_code = getattr(user, "language_code", "en").lower()
-                        if lang_code.startswith(("ru", "uk", "be")):
-                            lang = "ru"
-                        else:
-                            lang = "en"
-                    except Exception:
-                        lang = "en"
-
-                notified = bool(fields.get("Notified", False))
-
-                if not telegram_id or not raw_status:
-                    continue
-
-                # Очистка статуса от эмодзи
-                cleaned_status = (
-                    raw_status.replace("🟢", "")
-                    .replace("🟡", "")
-                    .replace("🔴", "")
-                    .replace(":", "")
-                    .replace(" ", "")
-                    .strip()
+
+# ==============================
+# 🔄 Обработка изменений статусов
+# ==============================
+async def handle_status_changes(bot, changes: List[ExpertChange]):
+    """Уведомляет пользователей об изменениях их анкет (события дельта-синхронизации)"""
+    approved_count = 0
+
+    for change in changes:
+        telegram_id = change.telegram_id
+
+        # --- Удалённые анкеты ---
+        if change.type == ChangeType.DELETED:
+            if not telegram_id:
+                continue
+            try:
+                await bot.send_message(
+                    chat_id=int(telegram_id),
+                    text="♻️ Обновляем интерфейс...",
+                    reply_markup=None
                 )
+                await bot.send_message(
+                    chat_id=int(telegram_id),
+                    text=(
+                        "📋 Ваша анкета больше не найдена в базе.\n"
+                        "Пожалуйста, заполните новую, чтобы участвовать в проектах PAZL Collab 🙌"
+                    ),
+                    reply_markup=get_main_menu("ru")
+                )
+                logging.info(f"🗑 Анкета {telegram_id} удалена — показано стартовое меню.")
+            except Exception as e:
+                logging.error(f"⚠️ Ошибка при уведомлении об удалённой анкете ({telegram_id}): {e}")
+            continue
+
+        # Изменения без смены статуса пользователю не интересны
+        if change.type not in (ChangeType.CREATED, ChangeType.STATUS_CHANGED):
+            continue
+
+        fields = change.fields
+        raw_status = str(fields.get("Status", "")).strip()
+        if not telegram_id or not raw_status:
+            continue
+
+        normalized_status = normalize_status(raw_status)
+        if change.previous_status is not None and normalize_status(change.previous_status) == normalized_status:
+            # Например, "Approved" → "🟢 Approved": по сути статус тот же
+            continue
+
+        notified = bool(fields.get("Notified", False))
+        if notified or normalized_status not in ("approved", "declined"):
+            continue
+
+        lang = await _detect_lang(bot, fields, telegram_id)
+
+        # --- 🟢 Одобрено ---
+        if normalized_status == "approved":
+            approved_count += 1
+            approved_time = datetime.now().strftime("%d.%m.%Y в %H:%M")
+
+            text = (
+                f"🎉 Отличные новости!\n\n"
+                f"✅ Ваша анкета была одобрена {approved_time}.\n\n"
+                f"Теперь вы можете пользоваться всеми функциями PAZL Collab 🙌"
+                if lang == "ru"
+                else
+                f"🎉 Great news!\n\n"
+                f"✅ Your application was approved on {approved_time}.\n\n"
+                f"You can now enjoy all PAZL Collab features 🙌"
+            )
+
+            try:
+                await bot.send_message(
+                    chat_id=int(telegram_id),
+                    text=text,
+                    reply_markup=get_post_approval_menu(lang)
+                )
+                await notified_writes.update(change.record_id, {"Notified": True})
+                logging.info(f"✅ Пользователь {telegram_id} уведомлён об одобрении анкеты.")
+            except Exception as e:
+                logging.error(f"⚠️ Ошибка при уведомлении Approved ({telegram_id}): {e}")
+
+        # --- 🔴 Отклонено ---
+        else:
+            text = (
+                "⚠️ Ваша анкета требует доработки. "
+                "Администратор свяжется с вами для уточнений."
+                if lang == "ru"
+                else
+                "⚠️ Your form requires revision. The admin will contact you soon."
+            )
+            try:
+                await bot.send_message(
+                    chat_id=int(telegram_id),
+                    text=text,
+                    reply_markup=get_main_menu(lang)
+                )
+                await notified_writes.update(change.record_id, {"Notified": True})
+                logging.info(f"⚠️ Пользователь {telegram_id} уведомлён об отказе.")
+            except Exception as e:
+                logging.error(f"⚠️ Ошибка при уведомлении Declined ({telegram_id}): {e}")
+
+    # Отправляем оставшиеся отметки Notified одной пачкой
+    await notified_writes.flush()
+
+    if approved_count:
+        logging.info(f"⚙️ Обработано изменений: {len(changes)}, новых Approved: {approved_count}")
+
+
+# ==============================
+# 🔄 Проверка статусов экспертов
+# ==============================
+def create_status_sync(bot) -> ExpertsDeltaSync:
+    """Создаёт движок синхронизации со снимком каталога и подпиской на уведомления"""
+    sync = ExpertsDeltaSync(snapshot=get_catalog_snapshot())
+
+    async def on_changes(changes: List[ExpertChange]):
+        await handle_status_changes(bot, changes)
+
+    sync.subscribe(on_changes)
+    return sync
+
+
+async def check_expert_status(bot, sync: ExpertsDeltaSync = None):
+    """
+    Следит за статусами анкет и уведомляет пользователей при изменении
+    Опрашивает только изменённые записи (дельта-синхронизация) каждые SYNC_INTERVAL секунд
+    """
+    logging.info("🔍 Фоновый мониторинг статусов экспертов запущен...")
 
-                # Унификация статусов
-                if cleaned_status in ["approved", "одобрено"]:
-                    normalized_status = "approved"
-                elif cleaned_status in ["pending", "намодерации"]:
-                    normalized_status = "pending"
-                elif cleaned_status in ["declined", "отклонено"]:
-                    normalized_status = "declined"
-                else:
-                    normalized_status = "unknown"
-
-                prev_status = known_statuses.get(telegram_id)
-                if normalized_status == prev_status:
-                    continue
-
-                # --- 🟢 Одобрено ---
-                if normalized_status == "approved" and not notified:
-                    approved_count += 1
-                    approved_time = datetime.now().strftime("%d.%m.%Y в %H:%M")
-
-                    text = (
-                        f"🎉 Отличные новости!\n\n"
-                        f"✅ Ваша анкета была одобрена {approved_time}.\n\n"
-                        f"Теперь вы можете пользоваться всеми функциями PAZL Collab 🙌"
-                        if lang == "ru"
-                        else
-                        f"🎉 Great news!\n\n"
-                        f"✅ Your application was approved on {approved_time}.\n\n"
-                        f"You can now enjoy all PAZL Collab features 🙌"
-                    )
-
-                    try:
-                        await bot.send_message(
-                            chat_id=int(telegram_id),
-                            text=text,
-                            reply_markup=get_post_approval_menu(lang)
-                        )
-                        table.update(record_id, {"Notified": True})
-                        logging.info(f"✅ Пользователь {telegram_id} уведомлён об одобрении анкеты.")
-                    except Exception as e:
-                        logging.error(f"⚠️ Ошибка при уведомлении Approved ({telegram_id}): {e}")
-
-                # --- 🔴 Отклонено ---
-                elif normalized_status == "declined" and not notified:
-                    text = (
-                        "⚠️ Ваша анкета требует доработки. "
-                        "Администратор свяжется с вами для уточнений."
-                        if lang == "ru"
-                        else
-                        "⚠️ Your form requires revision. The admin will contact you soon."
-                    )
-                    try:
-                        await bot.send_message(
-                            chat_id=int(telegram_id),
-                            text=text,
-                            reply_markup=get_main_menu(lang)
-                        )
-                        table.update(record_id, {"Notified": True})
-                        logging.info(f"⚠️ Пользователь {telegram_id} уведомлён об отказе.")
-                    except Exception as e:
-                        logging.error(f"⚠️ Ошибка при уведомлении Declined ({telegram_id}): {e}")
-
-                # Обновляем кэш
-                known_statuses[telegram_id] = normalized_status
-
-            if approved_count == 0:
-                logging.info("📭 Все одобренные анкеты уже уведомлены.")
-            else:
-                logging.info(f"⚙️ Проверено {total} записей, новых Approved: {approved_count}")
-
-        except Exception as e:
-            logging.error(f"❌ Ошибка при проверке статусов: {e}")
-
-        await asyncio.sleep(1800)  # Проверка каждые 30 минут
+    if sync is None:
+        sync = create_status_sync(bot)
+    await sync.run()
@@ -0,0 +1,59 @@
+"""Приём обновлений Telegram через webhook"""
+import asyncio
+import json
+
+from api.bot_webhook import BotWebhook
+
+
+class FakeDispatcher:
+    def __init__(self):
+        self.updates = []
+
+    async def feed_update(self, bot, update):
+        self.updates.append(update)
+
+
+def _webhook() -> BotWebhook:
+    return BotWebhook(bot=object(), dispatcher=FakeDispatcher(), secret="secret", max_concurrency=2)
+
+
+def test_valid_update_is_processed():
+    async def scenario():
+        webhook = _webhook()
+        assert webhook.accept(json.dumps({"update_id": 1}).encode("utf-8"))
+        await asyncio.sleep(0)
+        await asyncio.gather(*webhook._tasks)
+        return webhook.dispatcher.updates
+
+    updates = asyncio.run(scenario())
+    assert [update.update_id for update in updates] == [1]
+
+
+def test_malformed_update_is_acknowledged_and_dropped():
+    async def scenario():
+        webhook = _webhook()
+        results = [
+            webhook.accept(json.dumps({"update_id": "not-a-number", "message": 5}).encode("utf-8")),
+            webhook.accept(json.dumps({"no_update_id": True}).encode("utf-8")),
+            webhook.accept(b"{not json"),
+        ]
+        return results, webhook
+
+    results, webhook = asyncio.run(scenario())
+    # True — ответ 200: Telegram не будет повторять доставку
+    assert results == [True, True, True]
+    assert not webhook._tasks
+    assert webhook.dispatcher.updates == []
+
+
+def test_full_queue_is_rejected():
+    async def scenario():
+        webhook = _webhook()
+        body = json.dumps({"update_id": 1}).encode("utf-8")
+        accepted = [webhook.accept(body) for _ in range(webhook.max_pending + 1)]
+        await asyncio.gather(*webhook._tasks)
+        return accepted
+
+    accepted = asyncio.run(scenario())
+    assert accepted[-1] is False
+    assert all(accepted[:-1])
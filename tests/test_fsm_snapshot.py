@@ -0,0 +1,86 @@
+"""Снимок данных FSM: одно чтение и одна запись на обновление без потери изменений"""
+import asyncio
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from middlewares.fsm_snapshot import FSMSnapshotMiddleware
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+async def toggle(event, data):
+    """Как переключатель мультивыбора: чтение, сетевой вызов, запись"""
+    state = data["state"]
+    selected = (await state.get_data()).get("main_direction", [])
+    # callback.answer() / edit_text — во время запроса приходит следующее нажатие
+    await asyncio.sleep(0.01)
+    selected.append(event)
+    await state.update_data(main_direction=selected)
+
+
+def test_concurrent_updates_of_one_user_do_not_overwrite_each_other():
+    async def scenario():
+        storage = MemoryStorage()
+        middleware = FSMSnapshotMiddleware()
+        await asyncio.gather(
+            middleware(toggle, "a", {"state": FSMContext(storage, KEY)}),
+            middleware(toggle, "b", {"state": FSMContext(storage, KEY)}),
+        )
+        return await storage.get_data(KEY), middleware
+
+    data, middleware = asyncio.run(scenario())
+    assert data["main_direction"] == ["a", "b"]
+    # Блокировка освобождена и удалена
+    assert middleware._locks == {}
+
+
+def test_different_users_run_in_parallel():
+    async def scenario():
+        storage = MemoryStorage()
+        middleware = FSMSnapshotMiddleware()
+        other = StorageKey(bot_id=1, chat_id=20, user_id=20)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(
+            middleware(toggle, "a", {"state": FSMContext(storage, KEY)}),
+            middleware(toggle, "b", {"state": FSMContext(storage, other)}),
+        )
+        return loop.time() - started
+
+    # Оба хендлера ждали одновременно, а не по очереди
+    assert asyncio.run(scenario()) < 0.019
+
+
+def test_one_read_and_one_write_per_update():
+    class CountingStorage(MemoryStorage):
+        def __init__(self):
+            super().__init__()
+            self.reads = self.writes = 0
+
+        async def get_data(self, key):
+            self.reads += 1
+            return await super().get_data(key)
+
+        async def update_data(self, key, data):
+            self.writes += 1
+            record = self.storage[key]
+            record.data = {**record.data, **data}
+            return record.data.copy()
+
+    async def handler(event, data):
+        state = data["state"]
+        await state.get_data()
+        await state.get_data()
+        await state.update_data(a=1)
+        await state.update_data({"b": 2})
+
+    async def scenario():
+        storage = CountingStorage()
+        await FSMSnapshotMiddleware()(handler, None, {"state": FSMContext(storage, KEY)})
+        return storage.reads, storage.writes, await storage.get_data(KEY)
+
+    reads, writes, data = asyncio.run(scenario())
+    assert (reads, writes) == (1, 1)
+    assert data == {"a": 1, "b": 2}
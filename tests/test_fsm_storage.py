@@ -0,0 +1,55 @@
+"""SQLite-хранилище FSM: кэш в памяти не расходится с диском после clear()"""
+import asyncio
+
+from aiogram.fsm.storage.base import StorageKey
+
+from services.fsm_storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=10, user_id=10)
+
+
+def test_cleared_state_is_not_read_back_from_disk(tmp_path):
+    async def scenario():
+        storage = SQLiteStorage(path=str(tmp_path / "fsm.db"), flush_interval=0.01)
+        await storage.set_state(KEY, "FormStates:waiting_for_name")
+        await storage.set_data(KEY, {"lang": "ru", "name": "x"})
+        await storage.flush()
+
+        # Очистка анкеты: до сброса на диск в SQLite ещё лежит старая строка
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        before_flush = (await storage.get_state(KEY), await storage.get_data(KEY))
+        await storage.flush()
+        after_flush = (await storage.get_state(KEY), await storage.get_data(KEY))
+        await storage.close()
+
+        # И после перезапуска запись не возвращается
+        reopened = SQLiteStorage(path=str(tmp_path / "fsm.db"))
+        after_restart = (await reopened.get_state(KEY), await reopened.get_data(KEY))
+        await reopened.close()
+        return before_flush, after_flush, after_restart
+
+    before_flush, after_flush, after_restart = asyncio.run(scenario())
+    assert before_flush == (None, {})
+    assert after_flush == (None, {})
+    assert after_restart == (None, {})
+
+
+def test_failed_flush_keeps_tombstone(tmp_path):
+    async def scenario():
+        storage = SQLiteStorage(path=str(tmp_path / "fsm.db"), flush_interval=60)
+        await storage.set_state(KEY, "FormStates:waiting_for_name")
+        await storage.flush()
+
+        def fail(batch):
+            raise OSError("disk full")
+
+        write_batch, storage._write_batch = storage._write_batch, fail
+        await storage.set_state(KEY, None)
+        await storage.flush()
+        state = await storage.get_state(KEY)
+        storage._write_batch = write_batch
+        await storage.close()
+        return state
+
+    assert asyncio.run(scenario()) is None
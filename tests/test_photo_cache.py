@@ -0,0 +1,77 @@
+"""Кэш фото экспертов: уменьшение до фиксированного размера (Pillow)"""
+import asyncio
+import io
+import os
+
+import pytest
+
+from services.photo_cache import PhotoCache, PHOTO_SIZES
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(out, format="JPEG")
+    return out.getvalue()
+
+
+def _cache(tmp_path, original: bytes) -> PhotoCache:
+    cache = PhotoCache(directory=str(tmp_path))
+    cache.downloads = []
+
+    async def download(url):
+        cache.downloads.append(url)
+        return original, "image/jpeg"
+
+    cache._download = download
+    return cache
+
+
+def test_card_size_is_resized_to_fixed_long_side(tmp_path):
+    cache = _cache(tmp_path, _jpeg(1600, 1200))
+    attachment = {"id": "att1", "url": "https://cdn.example/att1.jpg"}
+
+    path, digest, content_type = asyncio.run(cache.get(attachment, "card"))
+
+    with Image.open(path) as image:
+        assert max(image.size) == PHOTO_SIZES["card"]
+        assert image.size == (400, 300)
+    assert content_type == "image/jpeg"
+    # Исходник скачан с оригинального URL, а не с миниатюры Airtable
+    assert cache.downloads == ["https://cdn.example/att1.jpg"]
+
+
+def test_full_size_keeps_original_and_repeat_hits_disk_cache(tmp_path):
+    original = _jpeg(1600, 1200)
+    cache = _cache(tmp_path, original)
+    attachment = {"id": "att1", "url": "https://cdn.example/att1.jpg"}
+
+    path, _, _ = asyncio.run(cache.get(attachment, "full"))
+    again, _, _ = asyncio.run(cache.get(attachment, "full"))
+
+    with open(path, "rb") as f:
+        assert f.read() == original
+    assert again == path
+    assert len(cache.downloads) == 1
+
+
+def test_small_photo_is_not_upscaled(tmp_path):
+    cache = _cache(tmp_path, _jpeg(200, 100))
+    path, _, _ = asyncio.run(cache.get({"id": "att2", "url": "https://cdn.example/att2.jpg"}, "card"))
+
+    with Image.open(path) as image:
+        assert image.size == (200, 100)
+
+
+def test_blob_evicted_by_another_worker_is_fetched_again(tmp_path):
+    cache = _cache(tmp_path, _jpeg(1600, 1200))
+    attachment = {"id": "att1", "url": "https://cdn.example/att1.jpg"}
+
+    path, _, _ = asyncio.run(cache.get(attachment))
+    # Другой воркер с тем же каталогом вытеснил файл
+    os.remove(path)
+    path, _, _ = asyncio.run(cache.get(attachment))
+
+    assert os.path.exists(path)
+    assert len(cache.downloads) == 2